@@ -1,34 +1,23 @@
 #!/usr/bin/env python3
 
 import sys
-from math import pi, e
+from math import pi
 from matplotlib.pyplot import plot, show
-
-omega = -pi
-big_x = []
-omegas = []
+from numpy import arange, linspace
+from lib6003.dtft import dtft, upsample
 
 alpha = float(sys.argv[1])
 m = int(sys.argv[2])
-eps = 0.01
 inf = 100
 
-def delta(arg):
-	if arg < eps:
-		return 1
-	else:
-		return 0
-	
-while omega <= pi:
-	sum_1 = 0
-	for n in range(-inf, inf):
-		x_n = 0
-		for i in range(-inf, inf):
-			x_n += (alpha**i)*delta(n - i*m) 		
-		sum_1 += x_n*e**(-1j*omega*n)
-	big_x.append(abs(sum_1))
-	omegas.append(omega)
-	omega += pi/10
+# x[n] = alpha**(n/m) where n is a multiple of m (and 0 elsewhere), for
+# -inf <= n < inf: the geometric sequence alpha**i, upsampled by m
+x, n0 = upsample(alpha**arange(-inf, inf, dtype=float), m, -inf)
+x = x[-inf - n0 : inf - n0]
+n0 = -inf
+
+omegas = linspace(-pi, pi, 2001)
+big_x = abs(dtft(x, omegas, n0))
 
 print("alpha: {}, m: {}".format(alpha, m))	
 plot(omegas, big_x)
@@ -0,0 +1,102 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Import-time check for the modules used by batch workers, which only need WAV
+I/O and FFTs.  Run it with
+
+    python -m lib6003._importtime
+
+It imports each module in a fresh interpreter (under python -X importtime),
+and fails if the import takes longer than IMPORT_BUDGET or loads any of the
+optional dependencies in HEAVY_MODULES.
+"""
+
+import os
+import sys
+import subprocess
+
+# modules that must stay cheap to import
+MODULES = ("lib6003.audio", "lib6003.fft")
+
+# optional dependencies that these modules must only load on first use
+HEAVY_MODULES = ("matplotlib", "PIL", "pyaudio")
+
+# largest acceptable cumulative import time of each module (including numpy),
+# in seconds
+IMPORT_BUDGET = 0.25
+
+
+def import_time(module, repeat=3):
+    """
+    Import a module in a fresh interpreter, repeat times.
+
+    Returns a tuple with 2 elements:
+      * the shortest cumulative import time of the module, in seconds, as
+        reported by python -X importtime
+      * the sorted list of the HEAVY_MODULES that the import loaded
+    """
+    # make this copy of lib6003 importable from the subprocess
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [root] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    code = "import sys, %s; print(*(m for m in %r if m in sys.modules))" % (
+        module,
+        HEAVY_MODULES,
+    )
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        # lines look like "import time: <self us> | <cumulative us> | <name>",
+        # with the name indented by its nesting depth
+        for line in proc.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                seconds = int(fields[1]) / 1e6
+                best = seconds if best is None else min(best, seconds)
+        loaded = sorted(proc.stdout.split())
+    return best, loaded
+
+
+def check(modules=MODULES, budget=IMPORT_BUDGET):
+    """
+    Print the import time of each module, and raise AssertionError if one
+    exceeds budget (in seconds) or loads any of HEAVY_MODULES.
+    """
+    for module in modules:
+        seconds, loaded = import_time(module)
+        print(
+            "%-16s %8.1f ms  (budget %.0f ms)" % (module, seconds * 1e3, budget * 1e3)
+        )
+        assert not loaded, "importing %s loaded %s" % (module, ", ".join(loaded))
+        assert seconds <= budget, "importing %s took %.1f ms, over %.0f ms" % (
+            module,
+            seconds * 1e3,
+            budget * 1e3,
+        )
+
+
+if __name__ == "__main__":
+    check()
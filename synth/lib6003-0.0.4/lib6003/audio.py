@@ -14,127 +14,459 @@
 # You should have received a copy of the GNU General Public License along with
 # this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import os
 import sys
-import wave
 import numpy
-import tempfile
+import threading
 
 from . import wavfile
+from .resample import Resampler, resample
 
-try:
-    import pyaudio
-except:
-    pyaudio = None
+# the pyaudio module, imported on first use by _pyaudio (False until then)
+pyaudio = False
 
-_normalize_funcs = {
-    "int32": lambda d: d / 2147483648,
-    "int16": lambda d: d / 32768,
-    "uint8": lambda d: d / 256 - 0.5,
+
+def _pyaudio():
+    """
+    Import pyaudio on first use (it is slow to import, and only needed for
+    playback), returning None if it is not installed.
+    """
+    global pyaudio
+    if pyaudio is False:
+        try:
+            import pyaudio as module
+        except ImportError:
+            module = None
+        pyaudio = module
+    return pyaudio
+
+
+# (scale, offset) pairs mapping each integer sample type onto [-1, 1]
+_normalize_params = {
+    "int32": (1 / 2147483648, 0.0),
+    "int16": (1 / 32768, 0.0),
+    "uint8": (1 / 256, -0.5),
 }
 
+# number of frames converted at a time when reading memory-mapped files
+_MMAP_BLOCK_FRAMES = 65536
+
+
+def _to_mono_float(data, dtype, blocksize=None):
+    """
+    Convert an array of raw samples (as returned by wavfile.read) to a
+    1-dimensional array of normalized floats of the given dtype, down-mixing
+    multiple channels to mono.
+
+    The conversion is done in place on a single output buffer, optionally
+    blocksize frames at a time so that memory-mapped input is only touched one
+    block at a time.  If the input is already mono and of the requested type
+    (e.g. a memory-mapped float32 file), it is returned without a copy.
+    """
+    dtype = numpy.dtype(dtype)
+    if data.ndim > 2:
+        raise Exception("too many channels!")
+    scale, offset = _normalize_params.get(data.dtype.name, (None, 0.0))
+    if (
+        isinstance(data, numpy.memmap)
+        and data.ndim == 1
+        and data.dtype == dtype
+        and scale is None
+    ):
+        return data
+
+    num_frames = data.shape[0]
+    out = numpy.empty(num_frames, dtype=dtype)
+    step = blocksize or max(num_frames, 1)
+    for start in range(0, num_frames, step):
+        block = data[start : start + step]
+        out_block = out[start : start + step]
+        if block.ndim == 2:
+            block.mean(axis=1, dtype=dtype, out=out_block)
+        else:
+            out_block[...] = block
+        if scale is not None:
+            out_block *= scale
+            if offset:
+                out_block += offset
+    return out
+
 
-def wav_read(fname):
+def wav_read(fname, dtype=None, mmap=False, target_fs=None):
     """
     Read a wave file.  This will always convert to mono.
 
     Arguments:
       * fname: a string containing a file name of a WAV file.
+      * dtype (optional): if given (e.g. numpy.float32 or numpy.float64), the
+        samples are returned as a NumPy array of that type instead of as a
+        Python list, avoiding the cost of building one Python float per
+        sample.
+      * mmap (optional): if True, memory-map the file rather than reading it
+        into memory, and convert it to floats one block at a time.  Mono
+        float files whose type matches dtype are returned as a (copy-on-write)
+        memory map without being read at all.  Requires dtype.
+      * target_fs (optional): if given, the samples are converted to this
+        sampling rate (with resample.Resampler) before being returned.
 
     Returns a tuple with 2 elements:
-      * a 1-dimensional NumPy array with floats in the range [-1, 1]
-        representing samples.  the length of this array will be the number of
-        samples in the given wave file.
+      * a Python list (or a 1-dimensional NumPy array, if dtype was given)
+        with floats in the range [-1, 1] representing samples.  the length of
+        this will be the number of samples in the given wave file (or, if
+        target_fs was given, after conversion to that rate).
       * an integer containing the sample rate
     """
-    # load in data, convert to float
-    fs, data = wavfile.read(fname)
-    type_ = data.dtype.name
-    data = data.astype(float)
+    if mmap and dtype is None:
+        raise ValueError("mmap=True requires an array dtype")
+    fs, data = wavfile.read(fname, mmap=mmap)
+    out_dtype = float if dtype is None else dtype
+    out = _to_mono_float(data, out_dtype, _MMAP_BLOCK_FRAMES if mmap else None)
+    if target_fs is not None and target_fs != fs:
+        out = resample(out, fs, target_fs).astype(out_dtype, copy=False)
+        fs = target_fs
+    if dtype is None:
+        return out.tolist(), fs
+    return out, fs
 
-    # convert stereo to mono
-    if len(data.shape) > 2:
-        raise Exception("too many channels!")
-    elif len(data.shape) == 2:
-        data = data.mean(1)
 
-    # normalize to range [-1, 1]
-    try:
-        data = _normalize_funcs[type_](data)
-    except KeyError:
-        pass
+def wav_blocks(fname, blocksize, overlap=0, dtype=numpy.float64):
+    """
+    Read a wave file incrementally, converting each block to mono as in
+    wav_read.  Only one block of the file is held in memory at a time.
+
+    Arguments:
+      * fname: a string containing a file name of a WAV file.
+      * blocksize: the number of samples in each block.  The last block may
+        be shorter.
+      * overlap (optional): the number of samples shared by consecutive
+        blocks.  Defaults to 0.
+      * dtype (optional): the float type of the returned blocks.  Defaults to
+        numpy.float64.
+
+    Returns a tuple with 2 elements:
+      * a generator of 1-dimensional NumPy arrays with floats in the range
+        [-1, 1]
+      * an integer containing the sample rate
+    """
+    reader = wavfile.WavReader(fname)
+
+    def blocks():
+        with reader:
+            for block in reader.blocks(blocksize, overlap):
+                yield _to_mono_float(block, dtype)
 
-    return data.tolist(), fs
+    return blocks(), reader.rate
 
 
-def wav_write(samples, fs, fname):
+def wav_write(samples, fs, fname, target_fs=None, sample_format="int16"):
     """
     Write a wave file.
 
     Arguments:
       * samples: a Python list of numbers in the range [-1, 1], one for each
                  sample in the output WAV file.  Numbers in the list that are
-                 outside this range will be clipped to -1 or 1.
+                 outside this range will be clipped to -1 or 1.  Only the real
+                 part of complex numbers is written.
+      * fs: an integer representing the sampling rate of the output
+            (samples/second).
+      * fname: a string containing a file name of the WAV file to be written.
+      * target_fs (optional): if given, the samples are converted from fs to
+        this sampling rate (with resample.Resampler), and the file is written
+        at this rate.
+      * sample_format (optional): the type of the samples in the file: one
+        of 'int16' (the default), 'int24', 'int32', 'float32' or 'float64'.
+    """
+    assert sample_format in _sample_formats, "unknown sample format %r" % sample_format
+    if target_fs is not None and target_fs != fs:
+        samples = resample(_real(samples), fs, target_fs)
+        fs = target_fs
+    bit_depth = _sample_formats[sample_format][2]
+    wavfile.write(fname, fs, _quantize(samples, sample_format), bit_depth)
+
+
+def wav_write_blocks(blocks, fs, fname, target_fs=None, sample_format="int16"):
+    """
+    Write a wave file incrementally from an iterable of blocks of samples,
+    e.g. a generator that synthesizes a song one note at a time.  Each block
+    is clipped and converted as it arrives and the file header is completed
+    once the blocks are exhausted, so only one block is held in memory at a
+    time.
+
+    Arguments:
+      * blocks: an iterable of Python lists or NumPy arrays of numbers in the
+                range [-1, 1].  Numbers outside this range will be clipped to
+                -1 or 1, and only the real part of complex numbers is written.
       * fs: an integer representing the sampling rate of the output
             (samples/second).
       * fname: a string containing a file name of the WAV file to be written.
+      * target_fs (optional): as in wav_write.  The conversion is streamed,
+        with the resampler's state carried from each block to the next.
+      * sample_format (optional): as in wav_write.
+    """
+    assert sample_format in _sample_formats, "unknown sample format %r" % sample_format
+    dtype, _, bit_depth = _sample_formats[sample_format]
+    if target_fs is not None and target_fs != fs:
+        resampler = Resampler(fs, target_fs)
+        blocks = _resampled(resampler, blocks)
+        fs = target_fs
+    with wavfile.WavWriter(fname, fs, dtype, bit_depth=bit_depth) as writer:
+        for block in blocks:
+            writer.write(_quantize(block, sample_format))
+
+
+def _resampled(resampler, blocks):
+    for block in blocks:
+        yield resampler.process(_real(block))
+    yield resampler.flush()
+
+
+# (dtype, full scale, bit depth) of the samples written for each sample_format
+# of wav_write; 24-bit samples are held in the upper bits of int32 values
+_sample_formats = {
+    "int16": ("int16", 32767, None),
+    "int24": ("int32", 8388607, 24),
+    "int32": ("int32", 2147483647, None),
+    "float32": ("float32", None, None),
+    "float64": ("float64", None, None),
+}
+
+
+def _real(samples):
+    """
+    Returns the real part of samples as a NumPy array, so that complex samples
+    (e.g. a sum of complex exponentials) can be written as they always have.
+    """
+    return numpy.real(numpy.asarray(samples))
+
+
+def _quantize(samples, sample_format="int16"):
+    """
+    Clip samples to [-1, 1] and convert them to the given sample format.
     """
-    out = numpy.array(samples)
+    dtype, scale, bit_depth = _sample_formats[sample_format]
+    out = _real(samples).astype(float)
     out[out > 1.0] = 1.0
     out[out < -1.0] = -1.0
-    out = (out * 32767).astype("int16")
-    wavfile.write(fname, fs, out)
+    if scale is None:
+        return out.astype(dtype)
+    out = (out * scale).astype(dtype)
+    if bit_depth == 24:
+        out <<= 8
+    return out
 
 
-def wav_play(samples, fs):
+# PortAudio constants (as exported by pyaudio) used by the playback stream
+_paInt16 = 8
+_paContinue = 0
+_paComplete = 1
+
+# seconds between checks that the stream is still playing, while the writer
+# waits for room in the ring buffer
+_POLL_INTERVAL = 0.1
+
+
+class _RingBuffer(object):
+    """
+    Fixed-size FIFO of 16-bit samples, written by one thread and read by the
+    audio callback.  Writes block while the buffer is full (until the reader
+    closes the buffer or the stream stops); reads never block.
+
+    The writer calls finish() after its last write, and the reader calls
+    close() once it will read no more, which sets closed.
+    """
+
+    def __init__(self, size):
+        self._buf = numpy.zeros(size, dtype="int16")
+        self._start = 0
+        self._count = 0
+        self._finished = False
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def free(self):
+        with self._cond:
+            return self._buf.size - self._count
+
+    def write(self, samples, alive=None):
+        """
+        Append samples, waiting while the buffer is full.  While waiting,
+        alive() (if given) is checked every _POLL_INTERVAL seconds, so that
+        the write is abandoned if it returns False, as it is if the buffer is
+        closed.
+
+        Returns True if all the samples were written, or False if the write
+        was abandoned.
+        """
+        size = self._buf.size
+        while samples.size:
+            with self._cond:
+                while self._count == size and not self.closed:
+                    if alive is not None and not alive():
+                        return False
+                    self._cond.wait(_POLL_INTERVAL)
+                if self.closed:
+                    return False
+                n = min(size - self._count, samples.size)
+                end = (self._start + self._count) % size
+                first = min(n, size - end)
+                self._buf[end : end + first] = samples[:first]
+                self._buf[: n - first] = samples[first:n]
+                self._count += n
+            samples = samples[n:]
+        return True
+
+    def read(self, n):
+        """
+        Returns up to n samples, and whether the writer has finished and the
+        buffer is now empty.
+        """
+        size = self._buf.size
+        with self._cond:
+            n = min(n, self._count)
+            idx = (self._start + numpy.arange(n)) % size
+            out = self._buf[idx]
+            self._start = (self._start + n) % size
+            self._count -= n
+            self._cond.notify()
+            return out, self._finished and self._count == 0
+
+    def finish(self):
+        """
+        Mark the end of the samples; read reports done once they are drained.
+        """
+        with self._cond:
+            self._finished = True
+
+    def close(self):
+        """
+        Stop accepting samples, waking a blocked writer.
+        """
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+def _iter_blocks(source, blocksize):
+    if isinstance(source, (list, tuple, numpy.ndarray)):
+        source = numpy.asarray(source)
+        for start in range(0, source.size, blocksize):
+            yield source[start : start + blocksize]
+    else:
+        for block in source:
+            yield block
+
+
+def wav_stream(source, fs, blocksize=1024, buffer_blocks=8, audio=None):
     """
-    Play WAV data from a Python object and a sampling rate.  REQUIRES PYAUDIO.
+    Play audio through a callback-driven output stream, blocking until
+    playback finishes.  Samples are converted a block at a time into a ring
+    buffer that the audio callback drains, so playback starts as soon as the
+    buffer is full, without writing anything to disk.  REQUIRES PYAUDIO
+    (unless audio is given).
 
     Arguments:
-      * samples: a Python list of numbers in the range [-1, 1], one for each
-                 sample in the output WAV file.  Numbers in the list that are
-                 outside this range will be clipped to -1 or 1.
+      * source: a Python list or NumPy array of numbers in the range [-1, 1],
+                or an iterable of such blocks (e.g. a generator that
+                synthesizes audio on the fly).  Numbers outside this range
+                will be clipped to -1 or 1.
       * fs: an integer representing the sampling rate of the output
             (samples/second).
+      * blocksize (optional): the number of samples delivered per callback.
+                              Smaller blocks give lower latency.  Defaults to
+                              1024.
+      * buffer_blocks (optional): the capacity of the ring buffer, in blocks.
+                                  Defaults to 8.
+      * audio (optional): the object whose open() method creates the output
+                          stream.  Defaults to a new pyaudio.PyAudio(); a fake
+                          with the same open() signature can be passed when no
+                          audio device is present.
     """
-    if pyaudio is None:
-        print(
-            "pyaudio is required for playing WAV files directly from lib6003.",
-            file=sys.stderr,
-        )
-        return
-    filename = os.path.join(
-        tempfile.gettempdir(), "6003_wave_%s.wav" % abs(hash(tuple(samples)))
-    )
-    wav_write(samples, fs, filename)
-    f = wave.open(filename, "r")
+    owns_audio = audio is None
+    if owns_audio:
+        if _pyaudio() is None:
+            print(
+                "pyaudio is required for playing WAV files directly from lib6003.",
+                file=sys.stderr,
+            )
+            return
+        audio = pyaudio.PyAudio()
+
+    ring = _RingBuffer(blocksize * buffer_blocks)
+    finished = threading.Event()
+
+    def callback(in_data, frame_count, time_info, status):
+        out, done = ring.read(frame_count)
+        if out.size < frame_count:
+            out = numpy.concatenate((out, numpy.zeros(frame_count - out.size, "int16")))
+        if done:
+            ring.close()
+            finished.set()
+            return out.tobytes(), _paComplete
+        return out.tobytes(), _paContinue
+
     try:
-        p = pyaudio.PyAudio()
-        stream = p.open(
-            format=p.get_format_from_width(f.getsampwidth()),
-            channels=f.getnchannels(),
-            rate=f.getframerate(),
+        stream = audio.open(
+            format=_paInt16,
+            channels=1,
+            rate=fs,
             output=True,
+            frames_per_buffer=blocksize,
+            stream_callback=callback,
+            start=False,
         )
+        try:
+            _fill(stream, ring, source, blocksize)
+            while not finished.wait(0.1):
+                if not stream.is_active():
+                    break
+        finally:
+            ring.close()
+            stream.stop_stream()
+            stream.close()
+    finally:
+        if owns_audio:
+            audio.terminate()
 
-        data = f.readframes(10240)
-        while data:
-            stream.write(data)
-            data = f.readframes(10240)
 
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-    finally:
-        f.close()
-        os.unlink(filename)
+def _fill(stream, ring, source, blocksize):
+    """
+    Feed the blocks of source into the ring buffer, starting the stream once
+    the buffer is full (or the source is exhausted).  Stops early if the
+    stream stops or the buffer is closed before the source is drained.
+    """
+    started = False
+    for block in _iter_blocks(source, blocksize):
+        block = _quantize(block)
+        if not started and ring.free() < block.size:
+            stream.start_stream()
+            started = True
+        if not ring.write(block, stream.is_active if started else None):
+            return
+    ring.finish()
+    if not started:
+        stream.start_stream()
+
+
+def wav_play(samples, fs):
+    """
+    Play WAV data from a Python object and a sampling rate using
+    wav_stream.  REQUIRES PYAUDIO.
+
+    Arguments:
+      * samples: a Python list of numbers in the range [-1, 1], one for each
+                 sample in the output WAV file.  Numbers in the list that are
+                 outside this range will be clipped to -1 or 1.
+      * fs: an integer representing the sampling rate of the output
+            (samples/second).
+    """
+    wav_stream(samples, fs)
 
 
 def wav_file_play(fname):
     """
-    Play audio from a WAV file on disk using wav_play.  REQUIRES PYAUDIO.
+    Play audio from a WAV file on disk using wav_stream, reading it a block
+    at a time.  REQUIRES PYAUDIO.
 
     Arguments:
       * fname: a string containing a file name of the WAV file to be written.
     """
-    wav_play(*wav_read(fname))
+    wav_stream(*wav_blocks(fname, 10240))
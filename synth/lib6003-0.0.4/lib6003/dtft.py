@@ -0,0 +1,146 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy
+from math import pi
+
+from .fft import fft, czt
+
+# largest number of complex entries in the matrix built by one step of direct
+# evaluation (64 MiB)
+MAX_ELEMENTS = 1 << 22
+
+
+def dtft(x, omegas, n0=0, max_elements=MAX_ELEMENTS):
+    """
+    Evaluate the DTFT of a finite sequence at the given frequencies:
+
+        X(e^(j omega)) = sum_n x[n] e^(-j omega n)
+
+    If the frequencies are evenly spaced (e.g. from numpy.linspace), all of
+    them are computed at once with the chirp z-transform, in O(N log N) time
+    for N samples and frequencies; the spacing need not divide 2 pi.  Other
+    frequencies are evaluated directly, as matrix products over chunks of
+    frequencies.
+
+    x: sequence of numbers
+        The nonzero part of the sequence.
+
+    omegas: sequence of numbers
+        The frequencies at which to evaluate the DTFT, in radians/sample.
+
+    n0 (optional): int
+        The index n of x[0].  Defaults to 0.
+
+    max_elements (optional): int
+        The largest number of entries in a matrix built by direct
+        evaluation.
+
+    Returns a 1-dimensional NumPy array of complex numbers, one per frequency.
+    """
+    x = numpy.asarray(x).reshape(-1)
+    omegas = numpy.asarray(omegas, dtype=float).reshape(-1)
+    if x.size == 0 or omegas.size == 0:
+        return numpy.zeros(omegas.size, dtype=complex)
+
+    if _evenly_spaced(omegas):
+        delta = (omegas[-1] - omegas[0]) / (omegas.size - 1)
+        out = czt(x, omegas.size, numpy.exp(-1j * delta), numpy.exp(1j * omegas[0]))
+    else:
+        out = numpy.empty(omegas.size, dtype=complex)
+        n = numpy.arange(x.size)
+        step = max(max_elements // x.size, 1)
+        for lo in range(0, omegas.size, step):
+            chunk = omegas[lo : lo + step]
+            out[lo : lo + step] = numpy.exp(-1j * numpy.outer(chunk, n)) @ x
+    if n0:
+        out *= numpy.exp(-1j * omegas * n0)
+    return out
+
+
+def _evenly_spaced(omegas):
+    if omegas.size < 3:
+        return omegas.size == 2
+    steps = numpy.diff(omegas)
+    return abs(steps - steps.mean()).max() <= 1e-9 * max(abs(steps.mean()), 1e-300)
+
+
+def dtft_grid(x, num_points, n0=0):
+    """
+    Evaluate the DTFT of a finite sequence at the num_points frequencies
+    omega_k = -pi + 2*pi*k/num_points, for k = 0, ..., num_points-1, with a
+    single FFT of the sequence zero-padded (or, if it is longer than
+    num_points, wrapped around) to num_points samples.
+
+    x, n0: as for dtft.
+
+    Returns a tuple with 2 elements:
+      * a 1-dimensional NumPy array containing the frequencies
+      * a 1-dimensional NumPy array containing the DTFT at those frequencies
+    """
+    x = numpy.asarray(x).reshape(-1)
+    omegas = -pi + 2 * pi * numpy.arange(num_points) / num_points
+    # e^(-j omega_k i) = e^(-j 2 pi k i/num_points) (-1)^i for the sample x[i]
+    shifted = numpy.zeros(-(-x.size // num_points) * num_points, dtype=complex)
+    shifted[: x.size] = x
+    shifted[1 : x.size : 2] *= -1
+    folded = shifted.reshape(-1, num_points).sum(axis=0)
+    out = fft(folded) * num_points
+    if n0:
+        out *= numpy.exp(-1j * omegas * n0)
+    return omegas, out
+
+
+def upsample(x, m, n0=0):
+    """
+    Expand a sequence by a factor of m, inserting m-1 zeros between samples:
+    y[m*n] = x[n], and y is zero elsewhere.  The DTFT of y is X(e^(j m omega)).
+
+    x: sequence of numbers
+        The nonzero part of the sequence.
+
+    m: int
+        The expansion factor.
+
+    n0 (optional): int
+        The index n of x[0].  Defaults to 0.
+
+    Returns a tuple with 2 elements:
+      * a 1-dimensional NumPy array containing y from its first nonzero
+        sample to its last
+      * the index n of the first element of that array
+    """
+    assert m >= 1, "m must be a positive integer, not %r" % m
+    x = numpy.asarray(x).reshape(-1)
+    y = numpy.zeros(max(m * (x.size - 1) + 1, 0), dtype=x.dtype)
+    y[::m] = x
+    return y, m * n0
+
+
+def downsample(x, m, n0=0):
+    """
+    Compress a sequence by a factor of m, keeping every m-th sample:
+    y[n] = x[m*n].
+
+    x, m, n0: as for upsample.
+
+    Returns a tuple with 2 elements, as upsample does.
+    """
+    assert m >= 1, "m must be a positive integer, not %r" % m
+    x = numpy.asarray(x).reshape(-1)
+    # the first element of x whose index is a multiple of m
+    first = (-n0) % m
+    return x[first::m].copy(), (n0 + first) // m
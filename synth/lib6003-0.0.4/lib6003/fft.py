@@ -15,52 +15,240 @@
 # this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import numpy
-from numpy.fft import fft as nfft, ifft as nifft, fft2 as nfft2, ifft2 as nifft2
+from math import pi
 
+# the module providing the FFTs: scipy.fft (which can use several worker
+# threads) if available, otherwise numpy.fft.  Both are pocketfft builds that
+# cache their twiddle factors per transform length, so repeated transforms of
+# same-sized frames only pay for planning once.
+_backend = {"name": "auto", "module": None, "workers": None}
 
-def fft(x):
+
+def set_backend(name="auto", workers=None):
+    """
+    Choose the FFT implementation used by this module.
+
+    name: string
+        'numpy', 'scipy', or 'auto' (the default), which uses scipy.fft if it
+        is installed and numpy.fft otherwise.
+
+    workers (optional): int
+        The default number of threads each transform may use (scipy only).
+        Negative values count back from the number of CPUs, as in scipy.
+    """
+    assert name in {"auto", "numpy", "scipy"}, (
+        "name must be 'auto', 'numpy' or 'scipy', not %r" % name
+    )
+    _backend["name"] = name
+    _backend["module"] = None
+    _backend["workers"] = workers
+
+
+def _module():
+    if _backend["module"] is None:
+        if _backend["name"] == "numpy":
+            _backend["module"] = numpy.fft
+        else:
+            try:
+                import scipy.fft as module
+            except ImportError:
+                if _backend["name"] == "scipy":
+                    raise
+                module = numpy.fft
+            _backend["module"] = module
+    return _backend["module"]
+
+
+def _transform(name, x, n=None, axis=-1, workers=None):
+    module = _module()
+    if workers is None:
+        workers = _backend["workers"]
+    if workers is None or module is numpy.fft:
+        return getattr(module, name)(x, n=n, axis=axis)
+    return getattr(module, name)(x, n=n, axis=axis, workers=workers)
+
+
+def _wrap(transform, x):
+    """
+    Apply transform to x, converting Python lists to arrays and back.
+    """
+    if isinstance(x, list):
+        return transform(numpy.array(x)).tolist()
+    return transform(numpy.asarray(x))
+
+
+def fft(x, axis=None, workers=None):
     """
     fft function that is simply a wrapper around numpy's (very fast) FFT,
     modified to correct the scaling factor to be consistent with 6.003's
     definitions.
+
+    If axis is given, x may hold many frames (e.g. one per row), which are
+    all transformed along that axis in one call.  workers sets the number of
+    threads (see set_backend).
     """
-    if isinstance(x, list):
-        x = numpy.array(x)
-        islist = True
-    else:
-        islist = False
-    out = nfft(x) / (x.size)
-    return out.tolist() if islist else out
 
+    def transform(x):
+        if axis is None:
+            return _transform("fft", x, workers=workers) / x.size
+        return _transform("fft", x, axis=axis, workers=workers) / x.shape[axis]
+
+    return _wrap(transform, x)
 
-def ifft(x):
+
+def ifft(x, axis=None, workers=None):
     """
     Similarly, a wrapper around numpy's IFFT to correct the scaling factor to
-    be consistent with 6.003's definitions.
+    be consistent with 6.003's definitions.  axis and workers are as for fft.
     """
-    if isinstance(x, list):
-        x = numpy.array(x)
-        islist = True
-    else:
-        islist = False
-    out = nifft(x) * (x.size)
-    return out.tolist() if islist else out
+
+    def transform(x):
+        if axis is None:
+            return _transform("ifft", x, workers=workers) * x.size
+        return _transform("ifft", x, axis=axis, workers=workers) * x.shape[axis]
+
+    return _wrap(transform, x)
 
 
-def fft2(x):
+def rfft(x, axis=-1, workers=None):
+    """
+    FFT of real-valued input, with 6.003's scaling.  Only the coefficients
+    for k = 0, ..., N//2 are returned; the others are their complex
+    conjugates.  This takes about half the time of fft.  axis and workers are
+    as for fft.
+    """
+
+    def transform(x):
+        return _transform("rfft", x, axis=axis, workers=workers) / x.shape[axis]
+
+    return _wrap(transform, x)
+
+
+def irfft(x, n=None, axis=-1, workers=None):
+    """
+    Inverse of rfft, with 6.003's scaling, returning n real samples.  n
+    defaults to 2*(M-1) for M input coefficients, i.e. an even-length signal.
+    axis and workers are as for fft.
+    """
+
+    def transform(x):
+        length = 2 * (x.shape[axis] - 1) if n is None else n
+        return _transform("irfft", x, n=length, axis=axis, workers=workers) * length
+
+    return _wrap(transform, x)
+
+
+def fft2(x, axes=None, workers=None):
     """
     fft function that is simply a wrapper around numpy's (very fast) 2-D FFT,
     modified to correct the scaling factor to be consistent with 6.003's
     definitions.
+
+    If axes is given (e.g. (-2, -1)), x may be a stack of images, which are
+    all transformed over those axes in one call, each with its own scaling.
     """
-    x = numpy.array(x)
-    return nfft2(x) / (x.size)
+    x = numpy.asarray(x)
+    if axes is None:
+        return _transform2("fft2", x, (-2, -1), workers) / (x.size)
+    return _transform2("fft2", x, axes, workers) / _axes_size(x, axes)
 
 
-def ifft2(x):
+def ifft2(x, axes=None, workers=None):
     """
     Similarly, a wrapper around numpy's 2-D IFFT to correct the scaling factor to
-    be consistent with 6.003's definitions.
+    be consistent with 6.003's definitions.  axes is as for fft2.
+    """
+    x = numpy.asarray(x)
+    if axes is None:
+        return _transform2("ifft2", x, (-2, -1), workers) * (x.size)
+    return _transform2("ifft2", x, axes, workers) * _axes_size(x, axes)
+
+
+def _transform2(name, x, axes, workers):
+    module = _module()
+    if workers is None:
+        workers = _backend["workers"]
+    if workers is None or module is numpy.fft:
+        return getattr(module, name)(x, axes=axes)
+    return getattr(module, name)(x, axes=axes, workers=workers)
+
+
+def _axes_size(x, axes):
+    size = 1
+    for axis in axes:
+        size *= x.shape[axis]
+    return size
+
+
+def czt(x, m=None, w=None, a=1.0):
+    """
+    Chirp z-transform of x along its last axis, computed with FFTs
+    (Bluestein's algorithm) in O(N log N) time:
+
+        X[k] = sum_n x[n] a^(-n) w^(n k),  for k = 0, ..., m-1
+
+    m defaults to the length of x and w to e^(-2 pi j / m), in which case this
+    is the (unscaled) DFT.  With a = e^(j omega_0) and w = e^(-j delta), it
+    evaluates the DTFT of x at the m frequencies omega_0 + k*delta, whose
+    spacing need not divide 2 pi.
+    """
+    x = numpy.asarray(x)
+    n = x.shape[-1]
+    if m is None:
+        m = n
+    if w is None:
+        w = numpy.exp(-2j * pi / m)
+    size = 1 << (n + m - 2).bit_length()
+
+    k = numpy.arange(max(m, n))
+    chirp = w ** (k ** 2 / 2.0)
+    y = x * (a ** -numpy.arange(n) * chirp[:n])
+    v = numpy.zeros(size, dtype=complex)
+    v[:m] = 1 / chirp[:m]
+    if n > 1:
+        v[-(n - 1) :] = 1 / chirp[1:n][::-1]
+    out = _transform("ifft", _transform("fft", y, size) * _transform("fft", v))
+    return out[..., :m] * chirp[:m]
+
+
+def harmonic_coefficients(x, period, start=0, num_coeffs=None, num_periods=1):
+    """
+    Compute Fourier series coefficients of a periodic signal from a window of
+    its samples, using 6.003's scaling:
+
+        a[k] = 1/(num_periods*period) * sum_n x[start+n] e^(-j k 2 pi n/period)
+
+    where n runs over the int(num_periods*period) samples in the window.
+    period (in samples) need not be an integer; e.g. a 261 Hz note sampled at
+    22050 Hz has period 22050/261.  The sum is evaluated for all k at once
+    with czt, in O(N log N) time.
+
+    x: sequence of numbers
+        The signal to analyze.
+
+    period: number
+        The period of the signal, in samples.
+
+    start (optional): int
+        The index of the first sample of the analysis window.  Defaults to 0.
+
+    num_coeffs (optional): int
+        The number of coefficients to return.  Defaults to int(period).
+
+    num_periods (optional): int
+        The number of periods the analysis window spans.  Averaging over more
+        periods reduces the effect of noise.  Defaults to 1.
+
+    Returns a 1-dimensional NumPy array containing a[0], ..., a[num_coeffs-1].
     """
-    x = numpy.array(x)
-    return nifft2(x) * (x.size)
+    x = numpy.asarray(x)
+    length = int(num_periods * period)
+    if num_coeffs is None:
+        num_coeffs = int(period)
+    window = x[start : start + length]
+    if window.size < length:
+        raise ValueError(
+            "signal is too short for %d period(s) starting at %d" % (num_periods, start)
+        )
+    w = numpy.exp(-2j * pi / period)
+    return czt(window, num_coeffs, w) / (num_periods * period)
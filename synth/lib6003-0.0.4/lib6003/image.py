@@ -14,13 +14,16 @@
 # You should have received a copy of the GNU General Public License along with
 # this program.  If not, see <https://www.gnu.org/licenses/>.
 
+# matplotlib and PIL are slow to import, so they are imported by the
+# functions that need them rather than here
+import io
 import os
 import numpy
-import matplotlib.pyplot as plt
+import multiprocessing
 
-from PIL import Image
 from math import e, pi
 from numpy.fft import fftshift, ifftshift
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from .fft import fft2, ifft2
 
@@ -43,16 +46,115 @@ def png_read(fname, zero_loc="center"):
         "zero_loc must be 'center' or 'topleft', not %r" % zero_loc
     )
     assert os.path.isfile(fname), "Not a file: %r" % fname
-
-    with Image.open(fname) as image:
-        im_arr = numpy.frombuffer(image.convert("L").tobytes(), dtype=numpy.uint8)
-        im_arr = im_arr.reshape((image.size[1], image.size[0]))
+    im_arr = _read_pixels(fname)
     if zero_loc == "center":
         im_arr = ifftshift(im_arr)
     return im_arr.astype(numpy.float64) / 255
 
 
-def png_write(array, fname, zero_loc="center", normalize=False, zoom=1):
+def png_read_batch(fnames, zero_loc="center", dtype=numpy.float64, threads=None):
+    """
+    Load many PNG images of the same size into a single 3-dimensional numpy
+    array, with one image per index of the first axis.  The array is
+    allocated once and each image is decoded straight into its slot.  Values
+    are scaled as in png_read.
+
+    fnames: string or sequence of strings
+        Either the name of a directory, all of whose .png files are loaded
+        (in sorted order), or a sequence of file names.
+
+    zero_loc (optional): string
+        As for png_read.
+
+    dtype (optional): numpy dtype
+        The type of the resulting array.  numpy.float32 halves the memory
+        needed.  Default: numpy.float64
+
+    threads (optional): int
+        If given, decode the images using a pool of this many threads.
+    """
+    assert zero_loc in {"center", "topleft"}, (
+        "zero_loc must be 'center' or 'topleft', not %r" % zero_loc
+    )
+    if isinstance(fnames, str):
+        assert os.path.isdir(fnames), "Not a directory: %r" % fnames
+        fnames = sorted(
+            os.path.join(fnames, f)
+            for f in os.listdir(fnames)
+            if f.lower().endswith(".png")
+        )
+    assert len(fnames) > 0, "no images to read"
+
+    first = _read_pixels(fnames[0])
+    out = numpy.empty((len(fnames),) + first.shape, dtype=dtype)
+
+    def load(i):
+        pixels = first if i == 0 else _read_pixels(fnames[i])
+        assert pixels.shape == first.shape, (
+            "%r is not the same size as %r" % (fnames[i], fnames[0])
+        )
+        if zero_loc == "center":
+            pixels = ifftshift(pixels)
+        numpy.divide(pixels, 255, out=out[i])
+
+    _run(load, range(len(fnames)), threads)
+    return out
+
+
+def filter_batch(images, mask):
+    """
+    Filter a stack of images in the frequency domain: the DFT of every image
+    is computed in one batched fft2 call, multiplied by the mask, and
+    transformed back.
+
+    images: numpy.ndarray
+        An array of shape (number of images, height, width), e.g. from
+        png_read_batch.
+
+    mask: numpy.ndarray
+        An array of shape (height, width) (or one per image) by which to
+        multiply the DFT coefficients, indexed like the output of fft2, i.e.
+        with the coefficient for (k_x, k_y) = (0, 0) at mask[0, 0].
+
+    Returns the real part of the filtered images, with the same dtype as the
+    input if it is a floating-point type.
+    """
+    images = numpy.asarray(images)
+    X = fft2(images, axes=(-2, -1))
+    X *= mask
+    out = ifft2(X, axes=(-2, -1)).real
+    if images.dtype.kind == "f":
+        out = out.astype(images.dtype, copy=False)
+    return out
+
+
+def _read_pixels(fname):
+    """
+    Decode a PNG image into a 2-dimensional uint8 array of brightness values.
+    """
+    from PIL import Image
+
+    with Image.open(fname) as image:
+        im_arr = numpy.frombuffer(image.convert("L").tobytes(), dtype=numpy.uint8)
+        return im_arr.reshape((image.size[1], image.size[0]))
+
+
+def _run(func, items, threads):
+    """
+    Call func on each item, using a pool of threads if threads is given.
+    PIL releases the GIL while encoding and decoding, so threads help there.
+    """
+    if threads:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(func, items))
+    else:
+        for item in items:
+            func(item)
+
+
+def png_write(
+    array, fname, zero_loc="center", normalize=False, zoom=1, check_real=True
+):
     """
     Save the given numpy array as an image with the given filename.  1
     translates to the brightest white in the output image, and 0 to the darkest
@@ -77,20 +179,78 @@ def png_write(array, fname, zero_loc="center", normalize=False, zoom=1):
 
     zoom (optional): int
         Factor by which to zoom when saving.
+
+    check_real (optional): boolean
+        If True (the default), assert that the imaginary parts of a complex
+        input are negligible.  Set to False to skip the check; the imaginary
+        parts are then discarded.
     """
     assert zero_loc in {"center", "topleft"}, (
         "zero_loc must be 'center' or 'topleft', not %r" % zero_loc
     )
-    assert (abs(array.imag) <= 1e-6).all(), "input array must contain real values only"
+    from PIL import Image
+
+    pixels = _to_pixels(array, zero_loc, normalize, check_real)
+    h, w = pixels.shape
+    out = Image.fromarray(pixels, mode="L")
+    if zoom != 1:
+        out = out.resize((int(w * zoom), int(h * zoom)), Image.NEAREST)
+    out.save(fname)
+
+
+def png_write_batch(arrays, fnames, threads=None, **kwargs):
+    """
+    Save each image in a stack as a PNG file, using png_write.
+
+    arrays: numpy.ndarray
+        A 3-dimensional array holding one image per index of its first axis
+        (or any sequence of 2-dimensional arrays).
+
+    fnames: string or sequence of strings
+        Either one file name per image, or a pattern such as 'frame%04d.png'
+        that is formatted with the index of each image.
+
+    threads (optional): int
+        If given, encode the images using a pool of this many threads.
+
+    Any other keyword arguments are passed on to png_write.
+    """
+    if isinstance(fnames, str):
+        fnames = [fnames % i for i in range(len(arrays))]
+    assert len(fnames) == len(arrays), "need one file name per image"
+
+    def save(i):
+        png_write(arrays[i], fnames[i], **kwargs)
+
+    _run(save, range(len(fnames)), threads)
+
+
+def _to_pixels(array, zero_loc, normalize, check_real):
+    """
+    Convert an array of brightness values to 8-bit pixels, rounding and
+    clipping in place on a single temporary array.
+    """
+    array = numpy.asarray(array)
+    if numpy.iscomplexobj(array):
+        if check_real:
+            # two reductions over the imaginary part, which is a view
+            imag = array.imag
+            assert imag.size == 0 or (
+                imag.max() <= 1e-6 and imag.min() >= -1e-6
+            ), "input array must contain real values only"
+        array = array.real
     if zero_loc == "center":
         array = fftshift(array)
     if normalize:
-        array = array - numpy.min(array)
-        array = array / numpy.max(array)
-    h, w = array.shape
-    out = Image.new(mode="L", size=(w, h))
-    out.putdata(numpy.around(255 * array).reshape(w * h))
-    out.resize((int(w * zoom), int(h * zoom)), Image.NEAREST).save(fname)
+        lo = numpy.min(array)
+        scale = 255 / (numpy.max(array) - lo)
+    else:
+        lo, scale = 0, 255
+    values = numpy.subtract(array, lo, dtype=numpy.float64)
+    values *= scale
+    numpy.around(values, out=values)
+    numpy.clip(values, 0, 255, out=values)
+    return values.astype(numpy.uint8)
 
 
 def show_image(
@@ -138,21 +298,106 @@ def show_image(
     ylabel (optional): string
         A label ver the vertical axis
     """
+    import matplotlib.pyplot as plt
+
+    _draw_image(
+        plt.figure(),
+        array,
+        colorscale,
+        zero_loc,
+        cmap,
+        title,
+        xlabel,
+        ylabel,
+        vmax,
+        vmin,
+    )
+    if show:
+        plt.show()
+
+
+def render_image(
+    array,
+    colorscale="linear",
+    zero_loc="center",
+    cmap="gray",
+    title="",
+    xlabel="",
+    ylabel="",
+    vmax=None,
+    vmin=None,
+    dpi=100,
+):
+    """
+    Render the plot that show_image would display to PNG data, without a
+    display.  This uses matplotlib's Agg renderer directly (not pyplot, so no
+    window or GUI backend is involved), and reuses a single figure for every
+    call in the process.  The arguments are as for show_image, plus:
+
+    dpi (optional): number
+        The resolution of the rendered plot.  Defaults to 100.
+
+    Returns the contents of a PNG file as a bytes object.
+    """
+    fig = _agg_figure()
+    fig.clf()
+    _draw_image(
+        fig,
+        array,
+        colorscale,
+        zero_loc,
+        cmap,
+        title,
+        xlabel,
+        ylabel,
+        vmax,
+        vmin,
+    )
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi)
+    return buf.getvalue()
+
+
+# the figure reused by render_image, created on first use
+_agg = {}
+
+
+def _agg_figure():
+    if "figure" not in _agg:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        _agg["figure"] = fig
+    return _agg["figure"]
+
+
+def _draw_image(
+    fig, array, colorscale, zero_loc, cmap, title, xlabel, ylabel, vmax, vmin
+):
+    """
+    Draw an image with a colorbar on a new set of axes in the given figure.
+    """
     assert colorscale in {"linear", "log"}, (
         "coloscale must be 'linear' or 'log', not %r" % colorscale
     )
     assert zero_loc in {"center", "topleft"}, (
         "zero_loc must be 'center' or 'topleft', not %r" % zero_loc
     )
-    assert (abs(array.imag) <= 1e-6).all(), "input array must contain real values only"
-    array = array.real
-    plt.figure()
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
+    array = numpy.asarray(array)
+    if numpy.iscomplexobj(array):
+        imag = array.imag
+        assert imag.size == 0 or (
+            imag.max() <= 1e-6 and imag.min() >= -1e-6
+        ), "input array must contain real values only"
+        array = array.real
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
     if colorscale == "log":
-        array[array != 0] = numpy.log10(array[array != 0])
-        array[array == 0] = numpy.min(array - 1)
+        array = _log_scale(array)
     h, w = array.shape
     if zero_loc == "center":
         bounds = [
@@ -164,7 +409,7 @@ def show_image(
         array = fftshift(array)
     else:
         bounds = [0, w, h, 0]
-    i = plt.imshow(
+    i = ax.imshow(
         array,
         cmap=cmap,
         interpolation="nearest",
@@ -173,9 +418,18 @@ def show_image(
         vmin=vmin,
         vmax=vmax,
     )
-    plt.colorbar()
-    if show:
-        plt.show()
+    fig.colorbar(i, ax=ax)
+
+
+def _log_scale(array):
+    """
+    Returns log10 of the given array, with zeros replaced by a value 1 below
+    the smallest of the logarithms (and of 0), without modifying the input.
+    """
+    nonzero = array != 0
+    out = numpy.log10(array, out=numpy.zeros(array.shape), where=nonzero)
+    out[~nonzero] = out.min() - 1
+    return out
 
 
 def show_dft(array, color_scale="linear", color_limits=None, color_factor=1, show=True):
@@ -203,6 +457,51 @@ def show_dft(array, color_scale="linear", color_limits=None, color_factor=1, sho
         If set to True (the default), the plot will be immediately displayed.
         Otherwise, plt.show() will need to be called later to display the plot.
     """
+    mag_args, phase_args = _dft_plots(array, color_scale, color_limits, color_factor)
+    show_image(show=False, **mag_args)
+    show_image(show=show, **phase_args)
+
+
+def render_dft(array, color_scale="linear", color_limits=None, color_factor=1):
+    """
+    Render the magnitude and phase plots that show_dft would display to PNG
+    data, using render_image.  The arguments are as for show_dft.
+
+    Returns a tuple of 2 bytes objects: the magnitude plot and the phase plot.
+    """
+    mag_args, phase_args = _dft_plots(array, color_scale, color_limits, color_factor)
+    return render_image(**mag_args), render_image(**phase_args)
+
+
+def render_dft_batch(arrays, processes=None, **kwargs):
+    """
+    Render the DFT plots of many images with render_dft, in a pool of
+    processes.
+
+    arrays: sequence of numpy.ndarray
+        The spatial-domain images (e.g. a 3-dimensional array with one image
+        per index of its first axis).
+
+    processes (optional): int
+        The number of worker processes.  Defaults to the number of CPUs.
+
+    Any other keyword arguments are passed on to render_dft.
+
+    Returns a list with one (magnitude, phase) tuple of PNG data per image.
+    """
+    # matplotlib's font cache must not be shared with forked children, so the
+    # workers are started fresh
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        futures = [pool.submit(render_dft, array, **kwargs) for array in arrays]
+        return [future.result() for future in futures]
+
+
+def _dft_plots(array, color_scale, color_limits, color_factor):
+    """
+    Returns the show_image arguments for the magnitude and phase plots of the
+    DFT of the given image.
+    """
     X = fft2(array)
     phase = numpy.angle(X)
     mag = abs(X)
@@ -212,23 +511,22 @@ def show_dft(array, color_scale="linear", color_limits=None, color_factor=1, sho
             color_limits = (None, None)
         else:
             color_limits = (0, 1)
-    show_image(
-        mag * color_factor,
+    mag_args = dict(
+        array=mag * color_factor,
         colorscale=color_scale,
-        show=False,
         title=r"$\left|X[k_x, k_y]\right|$",
         xlabel="$k_x$",
         ylabel="$k_y$",
         vmin=color_limits[0],
         vmax=color_limits[1],
     )
-    show_image(
-        phase,
+    phase_args = dict(
+        array=phase,
         cmap="coolwarm",
         title=r"$\angle X[k_x, k_y]$",
         xlabel="$k_x$",
         ylabel="$k_y$",
         vmax=pi,
         vmin=-pi,
-        show=show,
     )
+    return mag_args, phase_args
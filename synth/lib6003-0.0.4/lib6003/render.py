@@ -0,0 +1,180 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy
+from math import pi
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .synthesis import render_note
+
+# default number of output samples rendered by one task
+SEGMENT_SIZE = 65536
+
+# per-process state of pool workers, set up by _init_worker
+_worker = {}
+
+
+def render_events(events, instruments, fs, workers=None, segment_size=SEGMENT_SIZE):
+    """
+    Render and mix a polyphonic, multi-instrument set of notes.
+
+    The output is cut into independent time segments.  Each segment is
+    rendered by one task in a process pool, which synthesizes the parts of
+    all notes overlapping it (with the phase they would have had if rendered
+    whole) and writes the mix straight into a shared-memory output buffer.
+    Segments do not overlap, so no locking is needed.
+
+    events: sequence of (start, frequency, duration, instrument) tuples
+        The notes to play.  start and duration are in seconds, frequency in
+        Hz, and instrument is a key into instruments.  Notes may overlap.
+
+    instruments: dict
+        Maps each instrument key to its harmonic coefficients (see
+        synthesis.render_note) or to a wavetable.Wavetable.
+
+    fs: number
+        The sampling rate, in samples/second.
+
+    workers (optional): int
+        The number of worker processes.  Defaults to the number of CPUs.  If
+        1, everything is rendered in the calling process.
+
+    segment_size (optional): int
+        The number of output samples per task.
+
+    Returns a 1-dimensional NumPy array containing the mixed samples.
+    """
+    keys = list(instruments)
+    index = {key: i for i, key in enumerate(keys)}
+    notes = numpy.array(
+        [
+            (round(fs * start), round(fs * duration), frequency, index[instrument], 1)
+            for start, frequency, duration, instrument in events
+        ],
+        dtype=float,
+    ).reshape(-1, 5)
+    voices = [instruments[key] for key in keys]
+    return _render_notes(notes, voices, fs, workers, segment_size)
+
+
+def render_score(score, instruments, fs, workers=None, segment_size=SEGMENT_SIZE):
+    """
+    Render and mix a score (see the score module), as render_events does.
+    Each note is scaled by its velocity.
+
+    score: numpy.ndarray
+        The notes to play, with starts and lengths in samples at the rate fs.
+
+    instruments: dict or sequence
+        Maps each instrument id used in the score to its harmonic
+        coefficients or wavetable.
+
+    fs, workers, segment_size: as for render_events.
+
+    Returns a 1-dimensional NumPy array containing the mixed samples.
+    """
+    ids, voice = numpy.unique(score["instrument"], return_inverse=True)
+    notes = numpy.empty((len(score), 5))
+    notes[:, 0] = score["start"]
+    notes[:, 1] = score["length"]
+    notes[:, 2] = score["frequency"]
+    notes[:, 3] = voice.reshape(-1)
+    notes[:, 4] = score["velocity"]
+    voices = [instruments[i] for i in ids.tolist()]
+    return _render_notes(notes, voices, fs, workers, segment_size)
+
+
+def _render_notes(notes, voices, fs, workers, segment_size):
+    """
+    Render an array of notes with one row of (start, length, frequency,
+    voice, velocity) per note.
+    """
+    length = int((notes[:, 0] + notes[:, 1]).max()) if len(notes) else 0
+
+    # with the notes sorted by start, those overlapping a segment all lie
+    # between the first that could still be sounding and the first that
+    # starts after the segment
+    notes = notes[numpy.argsort(notes[:, 0], kind="stable")]
+    starts = notes[:, 0]
+    longest = notes[:, 1].max() if len(notes) else 0
+    tasks = []
+    for seg_start in range(0, length, segment_size):
+        seg_end = min(seg_start + segment_size, length)
+        lo = numpy.searchsorted(starts, seg_start - longest, side="right")
+        hi = numpy.searchsorted(starts, seg_end, side="left")
+        candidates = notes[lo:hi]
+        active = candidates[:, 0] + candidates[:, 1] > seg_start
+        tasks.append((seg_start, seg_end, candidates[active]))
+
+    if workers == 1:
+        out = numpy.zeros(length)
+        for task in tasks:
+            _render_segment(out, voices, fs, *task)
+        return out
+
+    shm = shared_memory.SharedMemory(create=True, size=max(length, 1) * 8)
+    try:
+        out = numpy.ndarray(length, dtype=numpy.float64, buffer=shm.buf)
+        out[:] = 0
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shm.name, length, voices, fs),
+        ) as pool:
+            for future in [pool.submit(_render_task, *task) for task in tasks]:
+                future.result()
+        result = out.copy()
+    finally:
+        # the buffer cannot be released while an array still refers to it
+        out = None
+        shm.close()
+        shm.unlink()
+    return result
+
+
+def _render_segment(out, voices, fs, seg_start, seg_end, notes):
+    """
+    Mix the parts of the given notes that fall in [seg_start, seg_end) into
+    out, which is indexed from the start of the whole piece.
+    """
+    for start, length, frequency, voice, velocity in notes:
+        start, length = int(start), int(length)
+        lo = max(start, seg_start)
+        hi = min(start + length, seg_end)
+        phase = (2 * pi * frequency * (lo - start) / fs) % (2 * pi)
+        instrument = voices[int(voice)]
+        if hasattr(instrument, "render"):
+            samples, _ = instrument.render(frequency, hi - lo, fs, phase)
+        else:
+            samples, _ = render_note(instrument, frequency, hi - lo, fs, phase)
+        if velocity != 1:
+            samples = samples * velocity
+        out[lo:hi] += samples
+
+
+def _init_worker(shm_name, length, voices, fs):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["out"] = numpy.ndarray(length, dtype=numpy.float64, buffer=shm.buf)
+    _worker["voices"] = voices
+    _worker["fs"] = fs
+
+
+def _render_task(seg_start, seg_end, notes):
+    _render_segment(
+        _worker["out"], _worker["voices"], _worker["fs"], seg_start, seg_end, notes
+    )
@@ -0,0 +1,178 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy
+from math import gcd, log10, pi
+from numpy.lib.stride_tricks import as_strided
+
+# number of output samples computed per vectorized step, bounding the size of
+# the (outputs x taps) temporaries
+_CHUNK = 8192
+
+
+class Resampler(object):
+    """
+    Polyphase sample-rate converter for a rational ratio target_fs/fs = L/M.
+
+    Conceptually the input is upsampled by L (inserting zeros), low-pass
+    filtered with a Kaiser-windowed sinc, and downsampled by M; only the
+    filter taps that meet nonzero inputs are ever evaluated, for the output
+    samples that are kept.  Input can be fed in blocks of any size with
+    `process`, which keeps the filter history between calls, followed by a
+    final call to `flush`.
+
+    fs: int
+        The sampling rate of the input, in samples/second.
+
+    target_fs: int
+        The sampling rate of the output, in samples/second.
+
+    half_width (optional): int
+        The half-length of the low-pass filter, counted in samples at the
+        lower of the two rates, so that the width of its transition band is
+        the same fraction of the output band whichever way the rate changes.
+        When downsampling by a factor M/L, about half_width*M/L input samples
+        on each side of an output sample contribute to it.  Longer filters
+        give sharper cutoffs.  Defaults to 16.
+
+    rolloff (optional): number
+        The cutoff of the low-pass filter, as a fraction of the lower of the
+        two Nyquist frequencies.  Defaults to 0.95.
+
+    beta (optional): number
+        The shape parameter of the Kaiser window.  Defaults to 8.
+    """
+
+    def __init__(self, fs, target_fs, half_width=16, rolloff=0.95, beta=8.0):
+        g = gcd(int(fs), int(target_fs))
+        self.up = L = int(target_fs) // g
+        self.down = M = int(fs) // g
+        # the number of input samples on each side of an output sample that
+        # the filter spans: half_width samples at the lower rate, which are
+        # max(L, M) taps each at the upsampled rate
+        T = self._half = -(-half_width * max(L, M) // L)
+
+        # filter taps h[k] for k = -T*L, ..., T*L-1 (at the upsampled rate)
+        cutoff = 0.5 * rolloff / max(L, M)
+        k = numpy.arange(-T * L, T * L)
+        window = numpy.kaiser(2 * T * L + 1, beta)[:-1]
+        h = 2 * cutoff * L * numpy.sinc(2 * cutoff * k) * window
+        # phases[r, j] is the tap applied to input q-T+1+j for an output
+        # whose position at the upsampled rate is q*L + r
+        r = numpy.arange(L)[:, None]
+        j = numpy.arange(2 * T)[None, :]
+        self._phases = h[r + (T - 1 - j) * L + T * L]
+
+        # unconsumed input, starting from global input index self._base
+        self._buf = numpy.zeros(T - 1)
+        self._base = -(T - 1)
+        self._received = 0
+        self._produced = 0
+
+    def process(self, x):
+        """
+        Feed a block of input samples, returning a 1-dimensional array of all
+        the output samples that can be computed so far.
+        """
+        x = numpy.asarray(x, dtype=float)
+        self._buf = numpy.concatenate((self._buf, x))
+        self._received += x.size
+        # output m needs inputs up to floor(m*M/L) + T
+        stop = ((self._received - self._half) * self.up - 1) // self.down + 1
+        return self._produce(max(stop, self._produced))
+
+    def flush(self):
+        """
+        Return the remaining output samples, treating the input as followed
+        by silence.  In total, ceil(N*target_fs/fs) samples are produced for
+        N input samples.
+        """
+        self._buf = numpy.concatenate((self._buf, numpy.zeros(self._half + 1)))
+        total = -(-self._received * self.up // self.down)
+        return self._produce(max(total, self._produced))
+
+    def _produce(self, stop):
+        L, M, T = self.up, self.down, self._half
+        taps = 2 * T
+        buf = self._buf
+        out = numpy.empty(stop - self._produced)
+        for lo in range(self._produced, stop, _CHUNK):
+            m = numpy.arange(lo, min(lo + _CHUNK, stop))
+            q, r = divmod(m * M, L)
+            first = q - T + 1 - self._base
+            count = buf.size - taps + 1
+            windows = as_strided(
+                buf, shape=(count, taps), strides=(buf.strides[0],) * 2
+            )
+            out[lo - self._produced : m[-1] + 1 - self._produced] = numpy.einsum(
+                "ij,ij->i", windows[first], self._phases[r]
+            )
+        self._produced = stop
+
+        # drop the input that no later output needs
+        keep_from = (stop * M) // L - T + 1
+        if keep_from > self._base:
+            self._buf = buf[keep_from - self._base :]
+            self._base = keep_from
+        return out
+
+
+def resample(x, fs, target_fs, **kwargs):
+    """
+    Convert a whole signal from sampling rate fs to target_fs with a
+    Resampler (any keyword arguments are passed on to it).
+
+    Returns a 1-dimensional NumPy array of ceil(N*target_fs/fs) samples.
+    """
+    resampler = Resampler(fs, target_fs, **kwargs)
+    return numpy.concatenate((resampler.process(x), resampler.flush()))
+
+
+def _gain(frequency, fs, target_fs):
+    """
+    Returns the gain (in dB) of resample from fs to target_fs for a sinusoid
+    of the given frequency, measured away from the ends of the signal.
+    """
+    n = numpy.arange(fs)
+    y = resample(numpy.sin(2 * pi * frequency * n / fs), fs, target_fs)
+    steady = y[y.size // 4 : 3 * y.size // 4]
+    return 20 * log10(numpy.sqrt(2) * steady.std() + 1e-300)
+
+
+def _check_response(rates=((44100, 8000), (44100, 22050)), num_points=8):
+    """
+    Measure the frequency response of a Resampler (with its default
+    parameters) for the given (fs, target_fs) pairs, and raise AssertionError
+    unless the passband, up to 0.75 times the lower of the two Nyquist
+    frequencies, is flat to within 0.05 dB and the stopband, from 1.1 times
+    that Nyquist frequency up, is attenuated by at least 60 dB.
+    """
+    for fs, target_fs in rates:
+        nyquist = min(fs, target_fs) / 2
+        passband = numpy.linspace(0.05, 0.75, num_points) * nyquist
+        stopband = numpy.linspace(1.1 * nyquist, 0.95 * fs / 2, num_points)
+        ripple = max(abs(_gain(f, fs, target_fs)) for f in passband)
+        leak = max(_gain(f, fs, target_fs) for f in stopband)
+        print(
+            "%6d -> %6d: passband ripple %.3f dB, stopband gain %.1f dB"
+            % (fs, target_fs, ripple, leak)
+        )
+        assert ripple <= 0.05, "passband ripple of %.3f dB" % ripple
+        assert leak <= -60, "stopband gain of %.1f dB" % leak
+
+
+if __name__ == "__main__":
+    _check_response()
@@ -0,0 +1,156 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import numpy
+from math import pi
+
+from .audio import wav_read
+from .spectrogram import frames
+from .synthesis import band_limit, harmonic_limit
+from .wavetable import _pad, _lookup
+
+# samplers built by load_sampler, keyed by file and loop parameters
+_cache = {}
+
+
+class Sampler(object):
+    """
+    An instrument that plays a recorded note at any pitch by looping a
+    steady-state segment of the recording and resampling it.
+
+    The loop spans a whole number of periods of the note.  Its length is
+    chosen, near that many nominal periods, as the one whose end best matches
+    its start, and its last few periods are cross-faded into the samples
+    just before it, so that it repeats without a click.  A note is then
+    rendered by stepping through the loop at a fractional rate (with linear
+    or cubic interpolation), which costs O(1) per output sample however rich
+    the recording is.
+
+    As with wavetable.Wavetable, notes are rendered from copies of the loop
+    with the content at or above the Nyquist frequency of the note removed
+    (by zeroing the corresponding DFT bins of the loop), built on first use.
+
+    samples: sequence of numbers
+        A recording of a single sustained note.
+
+    fs: number
+        The sampling rate of the recording, in samples/second.
+
+    f0: number
+        The (nominal) fundamental frequency of the recorded note, in Hz.
+
+    start (optional): int
+        The first sample of the loop.  Defaults to 20000, which is within the
+        steady-state part of the provided recordings.
+
+    periods (optional): int
+        The number of periods in the loop.  Defaults to 32.
+
+    fade_periods (optional): int
+        The number of periods cross-faded at the end of the loop.  Defaults
+        to 4.
+
+    rolloff (optional): number
+        Taper the content near the Nyquist frequency; see
+        wavetable.Wavetable.
+    """
+
+    def __init__(
+        self, samples, fs, f0, start=20000, periods=32, fade_periods=4, rolloff=None
+    ):
+        samples = numpy.asarray(samples, dtype=float)
+        period = fs / f0
+        fade = int(round(fade_periods * period))
+        assert fade <= start, "start must leave room for a %d-sample fade" % fade
+
+        # loop lengths within 2% of the nominal one, each compared by the
+        # squared difference between the two periods after start and the two
+        # periods after start + length
+        nominal = periods * period
+        search = int(numpy.ceil(0.02 * nominal))
+        lengths = numpy.arange(
+            int(round(nominal)) - search, int(round(nominal)) + search + 1
+        )
+        window = int(round(2 * period))
+        segment = samples[start + lengths[0] : start + lengths[-1] + window]
+        if segment.size < lengths.size - 1 + window:
+            raise ValueError(
+                "recording is too short for a %d-period loop at sample %d"
+                % (periods, start)
+            )
+        head = samples[start : start + window]
+        errors = ((frames(segment, window, 1) - head) ** 2).sum(axis=1)
+        length = int(lengths[numpy.argmin(errors)])
+
+        loop = samples[start : start + length].copy()
+        # fade the end of the loop into the samples leading up to its start,
+        # which is what the loop continues into when it wraps around
+        weight = numpy.arange(fade, 0, -1) / (fade + 1)
+        loop[length - fade :] = (
+            weight * loop[length - fade :]
+            + (1 - weight) * samples[start - fade : start]
+        )
+
+        self.table = _pad(loop)
+        self.size = length
+        self.periods = periods
+        self.rolloff = rolloff
+        # DFT of the loop, whose bin j is at j/periods times the fundamental,
+        # and the band-limited loops made from it, keyed by number of bins
+        self._spectrum = numpy.fft.rfft(loop)
+        self._tables = {}
+
+    def _table(self, frequency, fs):
+        """
+        Returns the padded loop to render a note of the given frequency.
+        """
+        bins = self._spectrum.size
+        kept = harmonic_limit(frequency / self.periods, fs, bins)
+        if kept == bins and self.rolloff is None:
+            return self.table
+        if kept not in self._tables:
+            # as in Wavetable._table, with bins in place of harmonics
+            spectrum = band_limit(self._spectrum, 1.0, 2 * kept, self.rolloff)
+            self._tables[kept] = _pad(numpy.fft.irfft(spectrum, self.size))
+        return self._tables[kept]
+
+    def render(self, frequency, num_samples, fs, phase=0.0, interp="linear"):
+        """
+        Render a note by resampling the loop.  The arguments and return value
+        are those of wavetable.Wavetable.render; phase selects the starting
+        point within the first period of the loop.
+        """
+        # one pass through the loop covers self.periods periods of the note
+        cycles = phase / (2 * pi) + (frequency / fs) * numpy.arange(num_samples)
+        table = self._table(frequency, fs)
+        out = _lookup(table, self.size, cycles / self.periods, interp)
+        end = phase + 2 * pi * frequency * num_samples / fs
+        return out, end % (2 * pi)
+
+
+def load_sampler(fname, f0=261.0, start=20000, periods=32):
+    """
+    Build (or fetch from the cache) a Sampler from a WAV file, e.g. one of
+    the *_C4.wav notes.  Samplers are cached for the life of the process,
+    and are rebuilt if the file changes.  The arguments are those of Sampler.
+    """
+    fname = os.path.abspath(fname)
+    key = (fname, os.path.getmtime(fname), f0, start, periods)
+    if key not in _cache:
+        note, fs = wav_read(fname, dtype=numpy.float64)
+        _cache[key] = Sampler(note, fs, f0, start, periods)
+    return _cache[key]
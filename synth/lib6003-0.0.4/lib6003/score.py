@@ -0,0 +1,332 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import numpy
+import struct
+
+# one note event of a score: its first sample, its length in samples, its
+# fundamental frequency in Hz, its velocity (a gain in [0, 1]) and the id of
+# the instrument that plays it
+EVENT_DTYPE = numpy.dtype(
+    [
+        ("start", "<i8"),
+        ("length", "<i8"),
+        ("frequency", "<f8"),
+        ("velocity", "<f4"),
+        ("instrument", "<i4"),
+    ]
+)
+
+
+def new_score(num_events):
+    """
+    Returns a zero-filled score (a structured NumPy array of EVENT_DTYPE)
+    with room for num_events note events.
+    """
+    return numpy.zeros(num_events, dtype=EVENT_DTYPE)
+
+
+def from_tune(tune, fs, instrument=0, velocity=1.0, start=0):
+    """
+    Convert a tune, a sequence of (frequency, duration) tuples played one
+    after another (as taken by synthesis.iter_tune), to a score.  Each note
+    is round(fs*duration) samples long, and its start is the exact sum of the
+    lengths of the notes before it.
+
+    tune: sequence of (frequency, duration) tuples
+        The notes to play, with frequencies in Hz and durations in seconds.
+
+    fs: number
+        The sampling rate, in samples/second.
+
+    instrument, velocity (optional): int, number
+        The instrument id and velocity of every note.
+
+    start (optional): int
+        The first sample of the first note.  Defaults to 0.
+    """
+    tune = numpy.asarray(tune, dtype=float).reshape(-1, 2)
+    score = new_score(tune.shape[0])
+    score["frequency"] = tune[:, 0]
+    score["length"] = numpy.rint(fs * tune[:, 1])
+    score["start"][1:] = numpy.cumsum(score["length"][:-1])
+    score["start"] += start
+    score["velocity"] = velocity
+    score["instrument"] = instrument
+    return score
+
+
+def to_tune(score, fs):
+    """
+    Convert a score to a tune of (frequency, duration) tuples, in order of
+    start time, ignoring velocities, instruments and any gaps or overlaps
+    between notes.
+    """
+    score = numpy.sort(score, order="start")
+    durations = score["length"] / fs
+    return list(zip(score["frequency"].tolist(), durations.tolist()))
+
+
+def save(fname, score):
+    """
+    Save a score as a .npy file (see numpy.save).
+    """
+    numpy.save(fname, numpy.asarray(score, dtype=EVENT_DTYPE))
+
+
+def load(fname, fs=None, mmap=False):
+    """
+    Load a score from a .npy file written by save, or from a Standard MIDI
+    File (with the extension .mid or .midi; see read_midi).
+
+    fname: string
+        The name of the file.
+
+    fs (optional): number
+        The sampling rate, in samples/second.  Required for MIDI files, whose
+        times are converted to samples at this rate; .npy scores are already
+        in samples and are returned as they are.
+
+    mmap (optional): bool
+        If True, a .npy score is memory-mapped (read-only) rather than read
+        into memory, so that scores with millions of events can be opened
+        instantly.
+    """
+    if os.path.splitext(fname)[1].lower() in {".mid", ".midi"}:
+        assert fs is not None, "fs is required to load a MIDI file"
+        return read_midi(fname, fs)
+    score = numpy.load(fname, mmap_mode="r" if mmap else None)
+    assert score.dtype == EVENT_DTYPE, "%s does not contain a score" % fname
+    return score
+
+
+def midi_to_frequency(key):
+    """
+    Returns the equal-tempered frequency (in Hz) of a MIDI key number, where
+    key 69 is A4 = 440 Hz.
+    """
+    return 440.0 * 2.0 ** ((numpy.asarray(key) - 69) / 12.0)
+
+
+def frequency_to_midi(frequency):
+    """
+    Returns the (fractional) MIDI key number of a frequency in Hz.
+    """
+    return 69 + 12 * numpy.log2(numpy.asarray(frequency) / 440.0)
+
+
+# default tempo of a MIDI file without tempo events, in microseconds per beat
+_DEFAULT_TEMPO = 500000
+
+
+def read_midi(fname, fs):
+    """
+    Read the notes of a Standard MIDI File (format 0 or 1) as a score.  Note
+    numbers are converted to equal-tempered frequencies, velocities are
+    scaled to [0, 1], the MIDI channel (0-15) becomes the instrument id, and
+    times are converted to samples at the rate fs, following the file's tempo
+    changes.
+
+    fname: string or open file handle
+        The MIDI file.
+
+    fs: number
+        The sampling rate, in samples/second.
+    """
+    if hasattr(fname, "read"):
+        data = fname.read()
+    else:
+        with open(fname, "rb") as f:
+            data = f.read()
+
+    if data[:4] != b"MThd":
+        raise ValueError("Not a Standard MIDI File.")
+    header_size, fmt, num_tracks, division = struct.unpack(">IHHH", data[4:14])
+    if fmt not in (0, 1):
+        raise ValueError("Unsupported MIDI file format %d" % fmt)
+    pos = 8 + header_size
+
+    # (tick, tempo) of each tempo change, and (tick on, tick off, key,
+    # velocity, channel) of each note
+    tempos = [(0, _DEFAULT_TEMPO)]
+    notes = []
+    for _ in range(num_tracks):
+        chunk_id, size = struct.unpack(">4sI", data[pos : pos + 8])
+        pos += 8
+        if chunk_id == b"MTrk":
+            _read_track(data[pos : pos + size], tempos, notes)
+        pos += size
+
+    notes = numpy.array(notes, dtype=numpy.int64).reshape(-1, 5)
+    notes = notes[numpy.argsort(notes[:, 0], kind="stable")]
+    if division & 0x8000:
+        # SMPTE timing: frames per second and ticks per frame
+        frames = 256 - (division >> 8)
+        seconds = notes[:, :2] / float(frames * (division & 0xFF))
+    else:
+        seconds = _ticks_to_seconds(notes[:, :2], tempos, division)
+    samples = numpy.rint(seconds * fs).astype(numpy.int64)
+
+    score = new_score(notes.shape[0])
+    score["start"] = samples[:, 0]
+    score["length"] = samples[:, 1] - samples[:, 0]
+    score["frequency"] = midi_to_frequency(notes[:, 2])
+    score["velocity"] = notes[:, 3] / 127.0
+    score["instrument"] = notes[:, 4]
+    return score
+
+
+def _read_varlen(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def _read_track(data, tempos, notes):
+    """
+    Parse the events of one MTrk chunk, appending its tempo changes to
+    tempos and its notes to notes.
+    """
+    pos = 0
+    tick = 0
+    status = 0
+    # ticks and velocities of the notes currently on, keyed by (channel, key)
+    sounding = {}
+    while pos < len(data):
+        delta, pos = _read_varlen(data, pos)
+        tick += delta
+        if data[pos] & 0x80:
+            status = data[pos]
+            pos += 1
+        if status == 0xFF:
+            kind = data[pos]
+            size, pos = _read_varlen(data, pos + 1)
+            if kind == 0x51 and size == 3:
+                tempos.append((tick, int.from_bytes(data[pos : pos + 3], "big")))
+            elif kind == 0x2F:
+                break
+            pos += size
+        elif status in (0xF0, 0xF7):
+            size, pos = _read_varlen(data, pos)
+            pos += size
+        else:
+            kind = status & 0xF0
+            channel = status & 0x0F
+            if kind in (0xC0, 0xD0):
+                pos += 1
+                continue
+            key, velocity = data[pos], data[pos + 1]
+            pos += 2
+            if kind == 0x90 and velocity > 0:
+                sounding.setdefault((channel, key), []).append((tick, velocity))
+            elif kind == 0x80 or kind == 0x90:
+                started = sounding.get((channel, key))
+                if started:
+                    on, on_velocity = started.pop(0)
+                    notes.append((on, tick, key, on_velocity, channel))
+    # notes that are never released last until the end of the track
+    for (channel, key), started in sounding.items():
+        for on, velocity in started:
+            notes.append((on, tick, key, velocity, channel))
+
+
+def _ticks_to_seconds(ticks, tempos, ticks_per_beat):
+    """
+    Convert an array of MIDI ticks to seconds through a tempo map of (tick,
+    microseconds per beat) changes.
+    """
+    tempos = sorted(tempos, key=lambda change: change[0])
+    change_ticks = numpy.array([tick for tick, _ in tempos], dtype=float)
+    rates = numpy.array([tempo for _, tempo in tempos], dtype=float)
+    rates /= 1e6 * ticks_per_beat
+    # time (in seconds) at which each tempo change takes effect
+    change_seconds = numpy.concatenate(
+        ([0.0], numpy.cumsum(numpy.diff(change_ticks) * rates[:-1]))
+    )
+    i = numpy.searchsorted(change_ticks, ticks, side="right") - 1
+    return change_seconds[i] + (ticks - change_ticks[i]) * rates[i]
+
+
+def write_midi(fname, score, fs, ticks_per_beat=480, tempo=_DEFAULT_TEMPO):
+    """
+    Write a score as a format 0 Standard MIDI File.  Frequencies are rounded
+    to the nearest MIDI key, instrument ids to channels (modulo 16), and
+    sample times to ticks at the given resolution and (constant) tempo.
+
+    fname: string or open file handle
+        The output file.
+
+    score: numpy.ndarray
+        The score to write.
+
+    fs: number
+        The sampling rate of the score, in samples/second.
+
+    ticks_per_beat, tempo (optional): int
+        The resolution of the file, and its tempo in microseconds per beat.
+        The defaults, 480 ticks per beat at 120 beats per minute, give a
+        resolution of about 1 ms.
+    """
+    ticks_per_sample = ticks_per_beat * 1e6 / (tempo * fs)
+    on = numpy.rint(score["start"] * ticks_per_sample).astype(numpy.int64)
+    off = numpy.rint((score["start"] + score["length"]) * ticks_per_sample)
+    keys = numpy.clip(numpy.rint(frequency_to_midi(score["frequency"])), 0, 127)
+    velocities = numpy.clip(numpy.rint(score["velocity"] * 127), 1, 127)
+    channels = score["instrument"] % 16
+
+    # (tick, 0 for note off or 1 for note on, status, key, velocity), sorted
+    # so that notes are released before others start at the same tick
+    events = numpy.stack(
+        (
+            numpy.concatenate((off.astype(numpy.int64), on)),
+            numpy.repeat([0, 1], len(score)),
+            numpy.concatenate((0x80 | channels, 0x90 | channels)),
+            numpy.tile(keys.astype(numpy.int64), 2),
+            numpy.concatenate((numpy.full(len(score), 64), velocities)),
+        ),
+        axis=1,
+    ).astype(numpy.int64)
+    events = events[numpy.lexsort((events[:, 1], events[:, 0]))]
+
+    track = bytearray(b"\x00\xff\x51\x03" + tempo.to_bytes(3, "big"))
+    tick = 0
+    for when, _, status, key, velocity in events.tolist():
+        track += _varlen(when - tick)
+        track += bytes((status, key, velocity))
+        tick = when
+    track += b"\x00\xff\x2f\x00"
+
+    data = b"MThd" + struct.pack(">IHHH", 6, 0, 1, ticks_per_beat)
+    data += b"MTrk" + struct.pack(">I", len(track)) + bytes(track)
+    if hasattr(fname, "write"):
+        fname.write(data)
+    else:
+        with open(fname, "wb") as f:
+            f.write(data)
+
+
+def _varlen(value):
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
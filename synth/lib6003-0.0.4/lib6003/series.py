@@ -0,0 +1,250 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy
+from math import pi
+from fractions import Fraction
+
+from .fft import ifft
+from .synthesis import band_limit, _count_band_limited
+
+# largest number of complex entries in any one matrix built by the "matrix"
+# method (64 MiB)
+MAX_ELEMENTS = 1 << 22
+
+# longest period (in samples) for which the "fft" method is used by "auto"
+MAX_PERIOD = 1 << 21
+
+# number of samples harmonic_series processes at a time
+BLOCK_SIZE = 8192
+
+# number of harmonics between renormalizations in harmonic_series
+RENORM_EVERY = 32
+
+
+def fourier_series(
+    c_k,
+    d_k,
+    frequency,
+    num_samples,
+    fs,
+    start=0,
+    method="auto",
+    max_elements=MAX_ELEMENTS,
+    max_period=MAX_PERIOD,
+    band_limited=True,
+    rolloff=None,
+):
+    """
+    Evaluate a truncated Fourier series at evenly spaced times:
+
+        x[n] = sum_k c_k cos(2 pi k frequency t_n) + d_k sin(2 pi k frequency t_n)
+
+    where t_n = (start + n)/fs for n = 0, ..., num_samples-1.  The times are
+    computed from integer sample indices, so there is no accumulated error
+    however long the signal is.
+
+    c_k, d_k: sequences of numbers
+        The cosine and sine coefficients, starting with k=0.
+
+    frequency: number
+        The fundamental frequency, in Hz.
+
+    num_samples: int
+        The number of samples to compute.
+
+    fs: number
+        The sampling rate, in samples/second.
+
+    start (optional): int
+        The index of the first sample.  Defaults to 0.
+
+    method (optional): string
+        'fft' computes one period of the signal with an inverse FFT of a
+        spectrum holding the coefficients, and repeats it; this needs
+        frequency/fs to be (very nearly) a ratio q/p with p at most
+        max_period, and costs O(p log p) whatever the number of harmonics.
+        'matrix' splits the output into blocks that are all rotated from the
+        harmonics of one block in a matrix product (as in
+        synthesis.render_note), no matrix exceeding max_elements entries.
+        'auto' (the default) uses 'fft' when it applies and 'matrix'
+        otherwise.
+
+    band_limited (optional): bool
+        If True (the default), harmonics at or above the Nyquist frequency
+        fs/2 are left out rather than aliased (see synthesis.band_limit), and
+        counted in synthesis.band_limit_stats.
+
+    rolloff (optional): number
+        Taper the harmonics near the Nyquist frequency; see
+        synthesis.band_limit.
+
+    Returns a 1-dimensional NumPy array of num_samples samples.
+    """
+    assert method in {"auto", "fft", "matrix"}, (
+        "method must be 'auto', 'fft' or 'matrix', not %r" % method
+    )
+    c_k = numpy.asarray(c_k, dtype=float)
+    d_k = numpy.asarray(d_k, dtype=float)
+    assert c_k.shape == d_k.shape, "c_k and d_k must have the same length"
+    # sum_k a_k e^(j k theta) has real part sum_k c_k cos(k theta) + d_k sin(k theta)
+    coeffs = c_k - 1j * d_k
+    if band_limited:
+        coeffs = band_limit(coeffs, frequency, fs, rolloff)
+        _count_band_limited(c_k.size, coeffs.size, num_samples)
+
+    ratio = frequency / fs
+    period = _period(ratio, max_period)
+    if method == "fft" or (method == "auto" and period is not None):
+        assert period is not None, (
+            "frequency/fs = %r has no period of at most %d samples"
+            % (ratio, max_period)
+        )
+        return _series_fft(coeffs, period, num_samples, start)
+    return _series_matrix(coeffs, ratio, num_samples, start, max_elements)
+
+
+def _period(ratio, max_period):
+    """
+    Returns (q, p) such that ratio is q/p to within rounding error, with p at
+    most max_period, or None if there is no such fraction.
+    """
+    frac = Fraction(ratio).limit_denominator(max_period)
+    if abs(frac.numerator - ratio * frac.denominator) > 1e-9:
+        return None
+    return frac.numerator, frac.denominator
+
+
+def _series_fft(coeffs, period, num_samples, start):
+    q, p = period
+    # harmonic k completes k*q cycles every p samples, so it lands in bin
+    # (k*q) mod p of a length-p DFT (harmonics that alias onto the same bin
+    # are added together)
+    spectrum = numpy.zeros(p, dtype=complex)
+    bins = (numpy.arange(coeffs.size) * q) % p
+    numpy.add.at(spectrum, bins, coeffs)
+    one_period = ifft(spectrum).real
+    return one_period[(start + numpy.arange(num_samples)) % p]
+
+
+def _series_matrix(coeffs, ratio, num_samples, start, max_elements):
+    k = numpy.arange(coeffs.size)
+    out = numpy.empty(num_samples)
+    # blocks of about sqrt(num_samples) samples, as in render_note, but no
+    # more than fit in max_elements; at most as many blocks are rendered by
+    # each matrix product
+    block = max(int(numpy.ceil(numpy.sqrt(num_samples))), 1)
+    block = max(min(block, max_elements // max(coeffs.size, 1)), 1)
+    # basis[m, k] = e^(j 2 pi k ratio m) for the samples m of one block
+    basis = numpy.exp(2j * pi * ((numpy.outer(numpy.arange(block), k) * ratio) % 1))
+    step = block * block
+    for lo in range(0, num_samples, step):
+        # start sample of each block, as an exact integer
+        n0 = start + numpy.arange(lo, min(lo + step, num_samples), block)
+        cycles = (numpy.outer(k, n0) * ratio) % 1
+        rotated = coeffs[:, None] * numpy.exp(2j * pi * cycles)
+        chunk = (basis @ rotated).real.T.reshape(-1)
+        out[lo : lo + chunk.size] = chunk[: num_samples - lo]
+    return out
+
+
+def harmonic_series(c_k, d_k, theta, block_size=BLOCK_SIZE, renorm_every=RENORM_EVERY):
+    """
+    Evaluate a truncated Fourier series at arbitrary phases of its
+    fundamental:
+
+        x[n] = sum_k c_k cos(k theta[n]) + d_k sin(k theta[n])
+
+    Only one complex exponential is computed per sample: the harmonics are
+    generated one after another by the recurrence e^(j k theta) =
+    e^(j (k-1) theta) e^(j theta), vectorized over a block of samples.
+    Rounding errors would make the magnitude of the rotating phasor drift
+    away from 1 as k grows, so it is rescaled to unit magnitude every
+    renorm_every harmonics.
+
+    c_k, d_k: sequences of numbers
+        The cosine and sine coefficients, starting with k=0.
+
+    theta: sequence of numbers
+        The phase of the fundamental (in radians) at each sample, e.g.
+        2*pi*frequency*t.
+
+    block_size (optional): int
+        The number of samples processed at a time.
+
+    renorm_every (optional): int
+        The number of harmonics between renormalizations.
+
+    Returns a 1-dimensional NumPy array of samples, one per phase.
+    """
+    c_k = numpy.asarray(c_k, dtype=float)
+    d_k = numpy.asarray(d_k, dtype=float)
+    assert c_k.shape == d_k.shape, "c_k and d_k must have the same length"
+    theta = numpy.asarray(theta, dtype=float).reshape(-1)
+    out = numpy.empty(theta.size)
+    for lo in range(0, theta.size, block_size):
+        step = numpy.exp(1j * theta[lo : lo + block_size])
+        phasor = numpy.ones_like(step)
+        acc = numpy.full(step.size, c_k[0] if c_k.size else 0.0)
+        for k in range(1, c_k.size):
+            phasor *= step
+            if k % renorm_every == 0:
+                phasor /= abs(phasor)
+            if c_k[k]:
+                acc += c_k[k] * phasor.real
+            if d_k[k]:
+                acc += d_k[k] * phasor.imag
+        out[lo : lo + block_size] = acc
+    return out
+
+
+def _benchmark(num_samples=44100, harmonics=(100, 300, 1000), repeat=3):
+    """
+    Print the time taken to evaluate num_samples samples of random series of
+    the given numbers of harmonics, at phases that are not periodic in the
+    sample index, by harmonic_series and by direct evaluation of every
+    cos(k theta) and sin(k theta), along with the largest difference between
+    their results.
+    """
+    import timeit
+
+    rng = numpy.random.default_rng(0)
+    theta = numpy.cumsum(rng.uniform(0.01, 0.1, num_samples))
+    print(
+        "%10s %12s %12s %10s" % ("harmonics", "direct (s)", "recur. (s)", "max error")
+    )
+    for count in harmonics:
+        c_k, d_k = rng.standard_normal((2, count)) / count
+
+        def direct():
+            out = numpy.empty(num_samples)
+            k = numpy.arange(count)
+            for lo in range(0, num_samples, 1024):
+                angles = numpy.outer(theta[lo : lo + 1024], k)
+                out[lo : lo + 1024] = numpy.cos(angles) @ c_k + numpy.sin(angles) @ d_k
+            return out
+
+        def recurrence():
+            return harmonic_series(c_k, d_k, theta)
+
+        t_direct = min(timeit.repeat(direct, number=1, repeat=repeat))
+        t_recur = min(timeit.repeat(recurrence, number=1, repeat=repeat))
+        error = abs(direct() - recurrence()).max()
+        print("%10d %12.4f %12.4f %10.2e" % (count, t_direct, t_recur, error))
+
+
+if __name__ == "__main__":
+    _benchmark()
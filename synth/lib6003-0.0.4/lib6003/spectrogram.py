@@ -0,0 +1,179 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
+from .audio import wav_blocks
+from .fft import fft, rfft, ifft, irfft
+
+
+def frames(x, size, hop):
+    """
+    Split a signal into overlapping frames without copying it.
+
+    x: numpy.ndarray
+        A 1-dimensional array of samples.
+
+    size: int
+        The number of samples per frame.
+
+    hop: int
+        The number of samples between the starts of consecutive frames.
+
+    Returns a read-only 2-dimensional view of x, with one frame per row.
+    Samples at the end of x that do not fill a whole frame are left out.
+    """
+    x = numpy.ascontiguousarray(x)
+    assert x.ndim == 1, "x must be 1-dimensional"
+    assert size > 0 and hop > 0, "size and hop must be positive"
+    count = 0 if x.size < size else 1 + (x.size - size) // hop
+    step = x.strides[0]
+    return as_strided(
+        x, shape=(count, size), strides=(hop * step, step), writeable=False
+    )
+
+
+def _window(window, size):
+    if window is None or (isinstance(window, str) and window == "rect"):
+        return numpy.ones(size)
+    if isinstance(window, str):
+        assert window == "hann", "window must be 'hann', 'rect', or an array"
+        # periodic Hann window, whose overlapped copies sum to a constant
+        return numpy.hanning(size + 1)[:-1]
+    window = numpy.asarray(window, dtype=float)
+    assert window.shape == (size,), "window must have %d samples" % size
+    return window
+
+
+def stft(x, size, hop=None, window="hann", real=True):
+    """
+    Short-time Fourier transform of a signal.  Each frame is multiplied by
+    the window and all frames are transformed in one batched FFT, with
+    6.003's scaling.
+
+    x: sequence of numbers
+        The signal to transform.
+
+    size: int
+        The number of samples per frame.
+
+    hop (optional): int
+        The number of samples between consecutive frames.  Defaults to
+        size//4.
+
+    window (optional): string or numpy.ndarray
+        'hann' (the default), 'rect', or an array of size samples.
+
+    real (optional): bool
+        If True (the default), x is assumed to be real and only the
+        coefficients for k = 0, ..., size//2 are returned.
+
+    Returns a 2-dimensional array with one row of DFT coefficients per frame.
+    """
+    if hop is None:
+        hop = max(size // 4, 1)
+    framed = frames(numpy.asarray(x), size, hop) * _window(window, size)
+    if real:
+        return rfft(framed, axis=-1)
+    return fft(framed, axis=-1)
+
+
+def istft(X, size, hop=None, window="hann", real=True, length=None):
+    """
+    Invert stft by weighted overlap-add.  The frames are inverse-transformed
+    in one batched call, windowed again, summed, and divided by the sum of
+    the squared overlapping windows, so that istft(stft(x)) reproduces x
+    wherever the frames cover it.
+
+    X: numpy.ndarray
+        The output of stft (one row per frame).
+
+    size, hop, window, real: as passed to stft.
+
+    length (optional): int
+        The number of samples to return.  Defaults to the number of samples
+        covered by the frames.
+    """
+    if hop is None:
+        hop = max(size // 4, 1)
+    X = numpy.asarray(X)
+    w = _window(window, size)
+    if real:
+        framed = irfft(X, n=size, axis=-1)
+    else:
+        framed = ifft(X, axis=-1)
+    count = framed.shape[0]
+    total = 0 if count == 0 else (count - 1) * hop + size
+    if length is None:
+        length = total
+
+    # add the frames in ceil(size/hop) strided passes, each of which covers
+    # hop samples of every frame with no two frames overlapping
+    chunks = -(-size // hop)
+    padded = numpy.zeros((count, chunks * hop), dtype=framed.dtype)
+    padded[:, :size] = framed * w
+    wsq = numpy.zeros(chunks * hop)
+    wsq[:size] = w * w
+    out = numpy.zeros((count + chunks) * hop, dtype=framed.dtype)
+    norm = numpy.zeros((count + chunks) * hop)
+    for j in range(chunks):
+        seg = slice(j * hop, j * hop + count * hop)
+        out[seg] += padded[:, j * hop : (j + 1) * hop].reshape(-1)
+        norm[seg] += numpy.tile(wsq[j * hop : (j + 1) * hop], count)
+
+    out = out[:total]
+    norm = norm[:total]
+    nonzero = norm > 1e-10
+    out[nonzero] /= norm[nonzero]
+    if length > total:
+        out = numpy.concatenate((out, numpy.zeros(length - total, dtype=out.dtype)))
+    return out[:length]
+
+
+def spectrogram(x, size, hop=None, window="hann"):
+    """
+    Magnitudes of the STFT of a real signal (see stft for the arguments).
+    """
+    return abs(stft(x, size, hop, window))
+
+
+def stft_file(fname, size, hop=None, window="hann", frames_per_block=256):
+    """
+    Compute the STFT of a WAV file (converted to mono) without loading all of
+    it into memory.  The file is read in overlapping blocks of
+    frames_per_block frames with audio.wav_blocks, and the frames of each
+    block are transformed together.
+
+    Returns a tuple with 2 elements:
+      * a generator of 2-dimensional arrays, each holding the STFT rows (as
+        returned by stft) of up to frames_per_block consecutive frames.
+        Concatenated, they equal stft of the whole file.
+      * an integer containing the sample rate
+    """
+    if hop is None:
+        hop = max(size // 4, 1)
+    assert hop <= size, "hop must not exceed size when streaming"
+    blocksize = size + (frames_per_block - 1) * hop
+    blocks, fs = wav_blocks(fname, blocksize, overlap=size - hop)
+
+    def spectra():
+        for block in blocks:
+            out = stft(block, size, hop, window)
+            if out.shape[0]:
+                yield out
+
+    return spectra(), fs
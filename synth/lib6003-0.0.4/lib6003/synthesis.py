@@ -0,0 +1,304 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy
+import hashlib
+from math import pi
+from functools import partial
+from collections import OrderedDict
+
+# default size budget of a NoteCache, in bytes
+NOTE_CACHE_BYTES = 64 << 20
+
+# totals over all notes additively synthesized (by render_note and
+# series.fourier_series) since the last reset_band_limit_stats(): the number
+# of notes, and the numbers of harmonic-samples (harmonics times samples)
+# kept, and dropped for lying at or above the Nyquist frequency
+band_limit_stats = {"notes": 0, "kept": 0, "dropped": 0}
+
+
+def reset_band_limit_stats():
+    """
+    Set all the counts in band_limit_stats to zero.
+    """
+    for key in band_limit_stats:
+        band_limit_stats[key] = 0
+
+
+def harmonic_limit(frequency, fs, num_harmonics):
+    """
+    Returns the number of harmonics k = 0, 1, ... (out of num_harmonics)
+    whose frequency k*frequency is below the Nyquist frequency fs/2.
+    """
+    if frequency <= 0:
+        return num_harmonics
+    return max(min(num_harmonics, int(numpy.ceil(fs / (2 * frequency)))), 0)
+
+
+def band_limit(coeffs, frequency, fs, rolloff=None):
+    """
+    Drop the harmonics of a note that lie at or above the Nyquist frequency,
+    where they would alias, and optionally taper those just below it.
+
+    coeffs: sequence of complex numbers
+        The harmonic coefficients a_k, starting with k=0.
+
+    frequency, fs: number
+        The fundamental frequency of the note (in Hz) and the sampling rate.
+
+    rolloff (optional): number
+        If given, harmonics between rolloff*fs/2 and fs/2 are scaled by a
+        raised-cosine taper falling from 1 to 0, rather than being cut off
+        abruptly at fs/2.
+
+    Returns a 1-dimensional NumPy array of the coefficients to render.
+    """
+    coeffs = numpy.asarray(coeffs, dtype=complex)
+    kept = harmonic_limit(frequency, fs, coeffs.size)
+    coeffs = coeffs[:kept]
+    if rolloff is not None and kept:
+        coeffs = coeffs * _taper(frequency * numpy.arange(kept), fs, rolloff)
+    return coeffs
+
+
+def _taper(f, fs, rolloff):
+    """
+    Returns the gain of band_limit's raised-cosine taper at the frequencies f.
+    """
+    edge = rolloff * fs / 2
+    fade = numpy.clip((f - edge) / (fs / 2 - edge), 0, 1)
+    return 0.5 + 0.5 * numpy.cos(pi * fade)
+
+
+def _count_band_limited(num_harmonics, kept, num_samples):
+    band_limit_stats["notes"] += 1
+    band_limit_stats["kept"] += kept * num_samples
+    band_limit_stats["dropped"] += (num_harmonics - kept) * num_samples
+
+
+def render_note(coeffs, frequency, num_samples, fs, phase=0.0, rolloff=None):
+    """
+    Additively synthesize one note from a table of harmonic coefficients.
+
+    The output is the real part of sum_k a_k e^(j k theta[n]), where
+    theta[n] = phase + 2*pi*frequency*n/fs.  Rather than evaluating every
+    harmonic at every sample, the note is split into blocks of equal length;
+    the harmonics over one block are computed once, and every block is then
+    obtained from them (rotated to that block's starting phase) in a single
+    matrix product.  Only the harmonics below the Nyquist frequency are
+    evaluated (see band_limit), so higher notes are cheaper to render.
+
+    coeffs: sequence of complex numbers
+        The harmonic coefficients a_k, starting with k=0.
+
+    frequency: number
+        The fundamental frequency of the note, in Hz.
+
+    num_samples: int
+        The length of the note, in samples.
+
+    fs: number
+        The sampling rate, in samples/second.
+
+    phase (optional): number
+        The phase of the fundamental (in radians) at the first sample.
+
+    rolloff (optional): number
+        Taper the harmonics near the Nyquist frequency; see band_limit.
+
+    Returns a tuple with 2 elements:
+      * a 1-dimensional NumPy array containing the samples of the note
+      * the phase of the fundamental at the sample following the note, to be
+        passed to the next note for a phase-continuous transition
+    """
+    num_harmonics = len(coeffs)
+    coeffs = band_limit(coeffs, frequency, fs, rolloff)
+    _count_band_limited(num_harmonics, coeffs.size, num_samples)
+    omega = 2 * pi * frequency / fs
+    k = numpy.arange(coeffs.size)
+    out = _render_harmonics(k, coeffs, omega, num_samples, phase)
+    return out, (phase + omega * num_samples) % (2 * pi)
+
+
+def _render_harmonics(k, coeffs, omega, num_samples, phase):
+    """
+    Returns num_samples samples of the real part of sum_i coeffs[i]
+    e^(j k[i] theta), where theta starts at phase and advances by omega per
+    sample, computed block by block as described in render_note.
+    """
+    # blocks of about sqrt(num_samples) samples minimize the number of complex
+    # exponentials needed for the basis and the block start phases combined
+    block = max(int(numpy.ceil(numpy.sqrt(num_samples))), 1)
+    num_blocks = -(-num_samples // block)
+    # basis[m, k] = e^(j k omega m) for the samples m of one block
+    basis = numpy.exp(1j * omega * numpy.outer(numpy.arange(block), k))
+    # start[k, b] = a_k e^(j k theta) at the start of block b
+    block_phase = phase + omega * block * numpy.arange(num_blocks)
+    start = coeffs[:, None] * numpy.exp(1j * numpy.outer(k, block_phase))
+    return (basis @ start).real.T.reshape(-1)[:num_samples]
+
+
+class NoteCache(object):
+    """
+    Least-recently-used cache of rendered notes, so that a note repeated in a
+    tune (same instrument, pitch, length and starting phase) is only
+    synthesized once.  Notes served from the cache are exactly those
+    render_note would produce.
+
+    Repeated notes rarely start at the same phase, though, since each note
+    starts where the previous one ended.  With exact_phase=False, the cache
+    trades accuracy for hits: each note is rendered once from phase 0, one
+    period longer than needed, and a note starting at any other phase is
+    served as a slice of that buffer starting s samples in, where s*omega is
+    the multiple of the per-sample phase step omega nearest to the requested
+    phase.  Each note then starts up to half a sample early or late, which
+    puts harmonic k up to k*omega/2 radians out of phase with render_note's
+    rendering of it.  For timbres with strong high harmonics the samples
+    differ a lot (by about 0.8 times the RMS of the signal for the trumpet in
+    synth/synthesizer), although each note still sounds the same, and the
+    end phase returned is the one actually reached so that the next note
+    carries on from there.
+
+    Cached notes are read-only arrays (or views of them) shared by every hit.
+
+    max_bytes (optional): int
+        The largest total size of the cached samples.  Defaults to 64 MiB.
+
+    exact_phase (optional): bool
+        If True (the default), only reuse notes that start at exactly the
+        same phase.  If False, reuse notes of any phase by shifting them by a
+        whole number of samples, as described above.
+
+    The attributes hits and misses count the lookups served from the cache
+    and those that had to render a note, and nbytes is the current size of
+    the cached samples.
+    """
+
+    def __init__(self, max_bytes=NOTE_CACHE_BYTES, exact_phase=True):
+        self.max_bytes = max_bytes
+        self.exact_phase = exact_phase
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        # instruments keyed by id, kept alive so their ids are not reused
+        self._instruments = {}
+
+    def render(self, coeffs, frequency, num_samples, fs, phase=0.0):
+        """
+        Render a note as render_note (or coeffs.render, for a wavetable)
+        would, returning it from the cache if possible; with
+        exact_phase=False, the note may start up to half a sample off.  The
+        arguments and return value are those of render_note.
+        """
+        omega = 2 * pi * frequency / fs
+        if self.exact_phase or omega <= 0:
+            key = (self._instrument_key(coeffs), frequency, num_samples, fs, phase)
+            shift, length = 0, num_samples
+        else:
+            key = (self._instrument_key(coeffs), frequency, num_samples, fs)
+            # a slice of length num_samples can start anywhere in one period
+            period = int(numpy.ceil(fs / frequency))
+            shift = int(round((phase % (2 * pi)) / omega))
+            phase, length = 0.0, num_samples + period
+
+        buf = self._entries.get(key)
+        if buf is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            render = getattr(coeffs, "render", None)
+            if render is None:
+                render = partial(render_note, coeffs)
+            buf, _ = render(frequency, length, fs, phase)
+            buf.setflags(write=False)
+            if buf.nbytes <= self.max_bytes:
+                self._entries[key] = buf
+                self.nbytes += buf.nbytes
+                while self.nbytes > self.max_bytes:
+                    _, old = self._entries.popitem(last=False)
+                    self.nbytes -= old.nbytes
+
+        end = (phase + omega * (shift + num_samples)) % (2 * pi)
+        return buf[shift : shift + num_samples], end
+
+    def _instrument_key(self, coeffs):
+        if hasattr(coeffs, "render"):
+            self._instruments[id(coeffs)] = coeffs
+            return id(coeffs)
+        coeffs = numpy.ascontiguousarray(coeffs, dtype=complex)
+        return hashlib.sha1(coeffs.tobytes()).hexdigest()
+
+    def clear(self):
+        """
+        Empty the cache and reset the counters.
+        """
+        self.__init__(self.max_bytes, self.exact_phase)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def iter_tune(coeffs, tune, fs, phase=0.0, cache=None):
+    """
+    Synthesize a tune note by note with render_note, keeping the phase
+    continuous from one note to the next.  Each note is round(fs*duration)
+    samples long.
+
+    coeffs: sequence of complex numbers, or wavetable.Wavetable
+        The harmonic coefficients a_k of the instrument, or a wavetable built
+        from them (which renders each note by table lookup instead).
+
+    tune: sequence of (frequency, duration) tuples
+        The notes to play, with frequencies in Hz and durations in seconds.
+
+    fs: number
+        The sampling rate, in samples/second.
+
+    phase (optional): number
+        The phase of the fundamental (in radians) at the start of the tune.
+
+    cache (optional): NoteCache
+        A cache through which to render the notes.  Notes served from it are
+        read-only.
+
+    Yields one 1-dimensional NumPy array of samples per note, so the output
+    can be passed straight to audio.wav_write_blocks.
+    """
+    if cache is not None:
+        render = partial(cache.render, coeffs)
+    else:
+        render = getattr(coeffs, "render", None)
+    if render is None:
+        render = partial(render_note, coeffs)
+    for frequency, duration in tune:
+        samples, phase = render(frequency, round(fs * duration), fs, phase)
+        yield samples
+
+
+def render_tune(coeffs, tune, fs, phase=0.0, cache=None):
+    """
+    Synthesize a whole tune into a single NumPy array.  The arguments are the
+    same as for iter_tune.
+    """
+    lengths = [round(fs * duration) for _, duration in tune]
+    out = numpy.empty(sum(lengths))
+    pos = 0
+    for length, samples in zip(lengths, iter_tune(coeffs, tune, fs, phase, cache)):
+        out[pos : pos + length] = samples
+        pos += length
+    return out
@@ -0,0 +1,263 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy
+from math import pi, inf, log10
+
+from .synthesis import harmonic_limit, render_tune
+from .synthesis import _count_band_limited, _render_harmonics, _taper
+
+# fidelity target of build_timbre when none is given, in dB
+DEFAULT_SNR = 40.0
+
+
+class Timbre(object):
+    """
+    A sparse timbre model: the harmonics of an instrument that are worth
+    synthesizing, stored as their indices k and complex amplitudes a_k.  It
+    renders notes the way synthesis.render_note renders the full table of
+    coefficients, at a cost proportional to the number of harmonics kept, and
+    can be passed anywhere an instrument is expected (synthesis.iter_tune,
+    synthesis.NoteCache, render.render_score).
+
+    harmonics: sequence of ints
+        The indices k of the harmonics, in increasing order.
+
+    amplitudes: sequence of complex numbers
+        The coefficients a_k of those harmonics.
+
+    num_harmonics (optional): int
+        The number of coefficients in the model this one was pruned from.
+        Defaults to one more than the highest index.
+
+    snr (optional): number
+        The signal-to-noise ratio (in dB) of this model relative to the one it
+        was pruned from, for the worst-case note.  Defaults to inf.
+    """
+
+    def __init__(self, harmonics, amplitudes, num_harmonics=None, snr=inf):
+        harmonics = numpy.asarray(harmonics, dtype=numpy.int64).reshape(-1)
+        amplitudes = numpy.asarray(amplitudes, dtype=complex).reshape(-1)
+        assert harmonics.shape == amplitudes.shape, (
+            "harmonics and amplitudes must have the same length"
+        )
+        assert numpy.all(numpy.diff(harmonics) > 0), (
+            "harmonics must be distinct and in increasing order"
+        )
+        if num_harmonics is None:
+            num_harmonics = int(harmonics[-1]) + 1 if harmonics.size else 0
+        self.harmonics = harmonics
+        self.amplitudes = amplitudes
+        self.num_harmonics = num_harmonics
+        self.snr = snr
+
+    def __len__(self):
+        return self.harmonics.size
+
+    def dense(self):
+        """
+        Returns the model as a full table of num_harmonics coefficients, with
+        zeros for the harmonics that were pruned (e.g. to build a
+        wavetable.Wavetable from it).
+        """
+        coeffs = numpy.zeros(self.num_harmonics, dtype=complex)
+        coeffs[self.harmonics] = self.amplitudes
+        return coeffs
+
+    def render(self, frequency, num_samples, fs, phase=0.0, rolloff=None):
+        """
+        Additively synthesize one note from the harmonics of the model, leaving
+        out those at or above the Nyquist frequency.  The arguments and return
+        value are those of synthesis.render_note.
+        """
+        keep = self.harmonics * frequency < fs / 2
+        k = self.harmonics[keep]
+        amplitudes = self.amplitudes[keep]
+        if rolloff is not None:
+            amplitudes = amplitudes * _taper(k * frequency, fs, rolloff)
+        _count_band_limited(self.harmonics.size, k.size, num_samples)
+        omega = 2 * pi * frequency / fs
+        out = _render_harmonics(k, amplitudes, omega, num_samples, phase)
+        return out, (phase + omega * num_samples) % (2 * pi)
+
+
+def harmonic_power(coeffs):
+    """
+    Returns the average power contributed by each harmonic to the real part
+    of sum_k a_k e^(j k theta): a_0.real**2 for k=0, and |a_k|**2/2 for the
+    others.
+    """
+    coeffs = numpy.asarray(coeffs, dtype=complex).reshape(-1)
+    power = abs(coeffs) ** 2 / 2
+    if coeffs.size:
+        power[0] = coeffs[0].real ** 2
+    return power
+
+
+def build_timbre(coeffs, snr=None, max_error=None, max_frequency=None, fs=None):
+    """
+    Build a Timbre from a full table of harmonic coefficients (e.g. from
+    fft.harmonic_coefficients), keeping the smallest set of harmonics that
+    meets a fidelity target.  Harmonics are kept in decreasing order of power
+    until the power of those left out is small enough.
+
+    Notes are rendered without the harmonics at or above the Nyquist
+    frequency (see synthesis.band_limit), which makes the pruned harmonics a
+    larger share of what is left of a high note.  So, given the highest
+    frequency the model must play, the target is met separately for every
+    number of harmonics (see synthesis.harmonic_limit) that the notes up to
+    that frequency are rendered with.
+
+    coeffs: sequence of complex numbers
+        The harmonic coefficients a_k, starting with k=0.
+
+    snr (optional): number
+        The lowest acceptable ratio (in dB) of the power of the waveform to
+        the power of the error introduced by pruning.
+
+    max_error (optional): number
+        The highest acceptable spectral error: the RMS of the error as a
+        fraction of the RMS of the waveform, so that max_error=0.01 is the
+        same as snr=40.
+
+    max_frequency, fs (optional): number
+        The highest fundamental frequency (in Hz) of the notes to be played,
+        and the sampling rate they are played at.  If they are not given, the
+        target is only met for notes that keep every harmonic.
+
+    At most one of snr and max_error may be given; if neither is,
+    snr=DEFAULT_SNR (40 dB) is used.
+
+    Returns a Timbre.
+    """
+    assert snr is None or max_error is None, "give at most one of snr and max_error"
+    if max_error is not None:
+        assert max_error > 0, "max_error must be positive, not %r" % max_error
+        snr = -20 * log10(max_error)
+    elif snr is None:
+        snr = DEFAULT_SNR
+
+    coeffs = numpy.asarray(coeffs, dtype=complex).reshape(-1)
+    power = harmonic_power(coeffs)
+    if max_frequency is None:
+        limits = [coeffs.size]
+    else:
+        assert fs is not None, "fs is required with max_frequency"
+        lowest = harmonic_limit(max_frequency, fs, coeffs.size)
+        limits = range(lowest, coeffs.size + 1)
+
+    # the union of the harmonics needed by the notes of each bucket
+    keep = numpy.zeros(coeffs.size, dtype=bool)
+    for limit in limits:
+        keep[:limit] |= _strongest(power[:limit], snr)
+
+    harmonics = numpy.flatnonzero(keep)
+    worst = min(_snr(power[:limit], keep[:limit]) for limit in limits)
+    return Timbre(harmonics, coeffs[harmonics], coeffs.size, worst)
+
+
+def _strongest(power, snr):
+    """
+    Returns a boolean mask of the fewest harmonics, taken in decreasing order
+    of power, whose left-out power is within the budget set by snr (in dB).
+    """
+    order = numpy.argsort(-power, kind="stable")
+    # dropped[i] is the power left out when only the i strongest are kept
+    dropped = numpy.append(numpy.cumsum(power[order][::-1])[::-1], 0.0)
+    count = int(numpy.argmax(dropped <= power.sum() * 10 ** (-snr / 10)))
+    mask = numpy.zeros(power.size, dtype=bool)
+    mask[order[:count]] = True
+    return mask
+
+
+def _snr(power, keep):
+    """
+    Returns the signal-to-noise ratio (in dB) of keeping only the harmonics
+    selected by the boolean mask keep.
+    """
+    error = power[~keep].sum()
+    return 10 * log10(power.sum() / error) if error > 0 else inf
+
+
+def save(fname, timbre):
+    """
+    Save a Timbre as a .npz file (see numpy.savez).
+    """
+    numpy.savez(
+        fname,
+        harmonics=timbre.harmonics,
+        amplitudes=timbre.amplitudes,
+        num_harmonics=timbre.num_harmonics,
+        snr=timbre.snr,
+    )
+
+
+def load(fname):
+    """
+    Load a Timbre from a .npz file written by save.
+    """
+    with numpy.load(fname) as data:
+        return Timbre(
+            data["harmonics"],
+            data["amplitudes"],
+            int(data["num_harmonics"]),
+            float(data["snr"]),
+        )
+
+
+def compare(coeffs, timbre, tune, fs, repeat=3):
+    """
+    Measure the trade-off between speed and fidelity of a Timbre, by
+    rendering a tune (without a cache) with it and with the full table of
+    coefficients it was built from.
+
+    coeffs: sequence of complex numbers
+        The full table of harmonic coefficients.
+
+    timbre: Timbre
+        The sparse model built from coeffs.
+
+    tune, fs: as for synthesis.render_tune.
+
+    repeat (optional): int
+        The number of times each rendering is timed; the fastest is reported.
+
+    Returns a dictionary with the keys:
+      * 'harmonics' and 'kept': the numbers of harmonics of the two models
+      * 'dense_time' and 'sparse_time': the rendering times, in seconds
+      * 'speedup': dense_time/sparse_time
+      * 'snr': the measured ratio (in dB) of the power of the full rendering
+        to the power of its difference from the sparse one
+    """
+    import timeit
+
+    dense = render_tune(coeffs, tune, fs)
+    sparse = render_tune(timbre, tune, fs)
+    dense_time = min(
+        timeit.repeat(lambda: render_tune(coeffs, tune, fs), number=1, repeat=repeat)
+    )
+    sparse_time = min(
+        timeit.repeat(lambda: render_tune(timbre, tune, fs), number=1, repeat=repeat)
+    )
+    error = ((dense - sparse) ** 2).sum()
+    return {
+        "harmonics": len(coeffs),
+        "kept": len(timbre),
+        "dense_time": dense_time,
+        "sparse_time": sparse_time,
+        "speedup": dense_time / sparse_time,
+        "snr": 10 * log10((dense ** 2).sum() / error) if error > 0 else inf,
+    }
@@ -0,0 +1,129 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import glob
+import numpy
+import hashlib
+import tempfile
+
+from .audio import wav_read
+
+# default limit on the total size of the cached files
+MAX_BYTES = 1 << 30
+
+
+def default_cache_dir():
+    """
+    Returns the directory used for cached samples when none is given: the
+    value of the LIB6003_CACHE_DIR environment variable if it is set, or
+    ~/.cache/lib6003 otherwise.
+    """
+    return os.environ.get(
+        "LIB6003_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "lib6003")
+    )
+
+
+def cached_wav_read(fname, cache_dir=None, max_bytes=MAX_BYTES):
+    """
+    Read a wave file like wav_read(fname, dtype=numpy.float32), caching the
+    decoded samples on disk.  The first read of a file stores its normalized
+    mono samples as a .npy file; later reads of the same (unchanged) file
+    memory-map that instead of decoding the WAV file again.
+
+    Cache entries are keyed by the file's absolute path, modification time
+    and size, so editing or replacing a file invalidates its entry.  When the
+    cached files exceed max_bytes in total, the least recently used ones are
+    deleted.
+
+    Arguments:
+      * fname: a string containing a file name of a WAV file.
+      * cache_dir (optional): the directory holding the cache.  Defaults to
+        default_cache_dir().
+      * max_bytes (optional): the size budget of the cache, in bytes.
+        Defaults to 1 GiB.
+
+    Returns a tuple with 2 elements:
+      * a read-only, memory-mapped 1-dimensional NumPy array of float32
+        samples in the range [-1, 1]
+      * an integer containing the sample rate
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    key = _cache_key(fname)
+
+    for path in glob.glob(os.path.join(cache_dir, key + "_*.npy")):
+        fs = int(os.path.basename(path)[len(key) + 1 : -4])
+        # the modification time of an entry records when it was last used
+        os.utime(path)
+        return numpy.load(path, mmap_mode="r"), fs
+
+    data, fs = wav_read(fname, dtype=numpy.float32)
+    path = os.path.join(cache_dir, "%s_%d.npy" % (key, fs))
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            numpy.save(f, data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    _evict(cache_dir, max_bytes, keep=path)
+    return numpy.load(path, mmap_mode="r"), fs
+
+
+def clear_cache(cache_dir=None):
+    """
+    Delete every entry in the given cache directory (by default,
+    default_cache_dir()).
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    for path in glob.glob(os.path.join(cache_dir, "*.npy")):
+        os.unlink(path)
+
+
+def _cache_key(fname):
+    fname = os.path.abspath(fname)
+    st = os.stat(fname)
+    ident = "%s\0%d\0%d" % (fname, st.st_mtime_ns, st.st_size)
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+def _evict(cache_dir, max_bytes, keep):
+    """
+    Delete least recently used entries until the cache fits in max_bytes,
+    never deleting the entry keep.
+    """
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, "*.npy")):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
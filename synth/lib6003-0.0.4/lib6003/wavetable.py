@@ -0,0 +1,177 @@
+# This file is part of lib6003, software for use in MIT's 6.003
+# Copyright (c) 2018-2019 by the 6.003 Staff <6.003-core@mit.edu>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import numpy
+from math import pi
+
+from .audio import wav_read
+from .fft import harmonic_coefficients
+from .synthesis import band_limit, harmonic_limit
+
+# wavetables built by load_wavetable, keyed by file and analysis parameters
+_cache = {}
+
+
+class Wavetable(object):
+    """
+    One period of a periodic waveform, sampled finely enough that any pitch
+    can be rendered from it by table lookup and interpolation.  Rendering
+    costs O(1) per output sample regardless of the number of harmonics.
+
+    So that high notes do not alias, a note is rendered from a table holding
+    only the harmonics below the Nyquist frequency (see synthesis.band_limit).
+    One such table is built, on first use, for each number of harmonics.
+
+    coeffs: sequence of complex numbers
+        The harmonic coefficients a_k (starting with k=0) of the waveform.
+        The table holds the real part of sum_k a_k e^(j k theta) for theta
+        evenly spaced over one period.
+
+    size (optional): int
+        The number of samples in the table.  Defaults to a power of 2 giving
+        at least 32 samples per period of the highest harmonic (and at least
+        4096).
+
+    rolloff (optional): number
+        Taper the harmonics near the Nyquist frequency; see
+        synthesis.band_limit.  The taper of each table is computed for the
+        lowest pitch that uses it.
+    """
+
+    def __init__(self, coeffs, size=None, rolloff=None):
+        coeffs = numpy.asarray(coeffs, dtype=complex)
+        if size is None:
+            size = max(4096, 1 << (32 * coeffs.size - 1).bit_length())
+        assert size > 2 * coeffs.size, "table size too small for %d harmonics" % (
+            coeffs.size
+        )
+        self.coeffs = coeffs
+        self.size = size
+        self.rolloff = rolloff
+        self.table = self._build(coeffs)
+        # band-limited tables, keyed by their number of harmonics
+        self._tables = {}
+
+    def _build(self, coeffs):
+        spectrum = numpy.zeros(self.size, dtype=complex)
+        spectrum[: coeffs.size] = coeffs
+        return _pad(numpy.fft.ifft(spectrum).real * self.size)
+
+    def _table(self, frequency, fs):
+        """
+        Returns the padded table to render a note of the given frequency.
+        """
+        kept = harmonic_limit(frequency, fs, self.coeffs.size)
+        if kept == self.coeffs.size and self.rolloff is None:
+            return self.table
+        if kept not in self._tables:
+            # a 1 Hz fundamental at the rate 2*kept has exactly kept harmonics
+            # below the Nyquist frequency, and is the lowest pitch that does
+            coeffs = band_limit(self.coeffs, 1.0, 2 * kept, self.rolloff)
+            self._tables[kept] = self._build(coeffs)
+        return self._tables[kept]
+
+    def render(self, frequency, num_samples, fs, phase=0.0, interp="linear"):
+        """
+        Render a note by stepping a phase accumulator through the table.
+
+        frequency: number
+            The fundamental frequency of the note, in Hz.
+
+        num_samples: int
+            The length of the note, in samples.
+
+        fs: number
+            The sampling rate, in samples/second.
+
+        phase (optional): number
+            The phase of the fundamental (in radians) at the first sample.
+
+        interp (optional): string
+            'linear' (the default) or 'cubic' (4-point Catmull-Rom)
+            interpolation between table entries.
+
+        Returns a tuple with 2 elements, as synthesis.render_note does:
+          * a 1-dimensional NumPy array containing the samples of the note
+          * the phase of the fundamental at the sample following the note
+        """
+        cycles = phase / (2 * pi) + (frequency / fs) * numpy.arange(num_samples)
+        out = _lookup(self._table(frequency, fs), self.size, cycles, interp)
+        end = phase + 2 * pi * frequency * num_samples / fs
+        return out, end % (2 * pi)
+
+
+def _pad(table):
+    """
+    Add one sample of wrap-around before a periodic table and two after, so
+    that the interpolators in _lookup never have to wrap indices themselves.
+    """
+    return numpy.concatenate((table[-1:], table, table[:2]))
+
+
+def _lookup(table, size, cycles, interp):
+    """
+    Interpolate a padded table (see _pad) of size samples at the given
+    positions, in units of passes through the table.
+    """
+    assert interp in {"linear", "cubic"}, (
+        "interp must be 'linear' or 'cubic', not %r" % interp
+    )
+    pos = (cycles % 1.0) * size
+    i = pos.astype(numpy.intp)
+    frac = pos - i
+    i += 1  # offset of the first sample within the padded table
+    t = table
+    if interp == "linear":
+        return t[i] + frac * (t[i + 1] - t[i])
+    p0, p1, p2, p3 = t[i - 1], t[i], t[i + 1], t[i + 2]
+    return p1 + 0.5 * frac * (
+        p2
+        - p0
+        + frac * (2 * p0 - 5 * p1 + 4 * p2 - p3 + frac * (3 * (p1 - p2) + p3 - p0))
+    )
+
+
+def load_wavetable(fname, f0=261.0, start=20000, size=None):
+    """
+    Build (or fetch from the cache) the wavetable of the instrument recorded
+    in a WAV file, e.g. one of the *_C4.wav notes.  The harmonic coefficients
+    are measured with fft.harmonic_coefficients over one period starting at
+    the given sample.  Tables are cached for the life of the process, and are
+    rebuilt if the file changes.
+
+    fname: string
+        The name of a WAV file containing a single sustained note.
+
+    f0 (optional): number
+        The fundamental frequency of the recorded note, in Hz.  Defaults to
+        261 (C4).
+
+    start (optional): int
+        The first sample of the period to analyze.  Defaults to 20000, which
+        is within the steady-state part of the provided recordings.
+
+    size (optional): int
+        The number of samples in the table; see Wavetable.
+    """
+    fname = os.path.abspath(fname)
+    key = (fname, os.path.getmtime(fname), f0, start, size)
+    if key not in _cache:
+        note, fs = wav_read(fname, dtype=numpy.float64)
+        coeffs = harmonic_coefficients(note, fs / f0, start=start)
+        _cache[key] = Wavetable(coeffs, size)
+    return _cache[key]
@@ -7,6 +7,10 @@ Functions
 
 `write`: Write a numpy array as a WAV file.
 
+`WavReader`: Read a WAV file incrementally, in blocks of frames.
+
+`WavWriter`: Write a WAV file incrementally, in blocks of frames.
+
 
 This file is a (slightly) modified copy of the scipy/io/wavfile.py from scipy
 (https://www.scipy.org/), which is licensed under the following terms:
@@ -48,7 +52,7 @@ import struct
 import warnings
 
 
-__all__ = ["WavFileWarning", "read", "write"]
+__all__ = ["WavFileWarning", "read", "write", "WavReader", "WavWriter"]
 
 
 class WavFileWarning(UserWarning):
@@ -128,6 +132,65 @@ def _read_fmt_chunk(fid, is_big_endian):
     return (size, format_tag, channels, fs, bytes_per_second, block_align, bit_depth)
 
 
+def _data_dtype(format_tag, bit_depth, is_big_endian):
+    """
+    Returns the numpy dtype string of the samples in a data chunk.  24-bit
+    samples have no numpy type; they are decoded to native int32 by
+    `_unpack_int24`.
+    """
+    bytes_per_sample = bit_depth // 8
+    if bit_depth == 24:
+        if format_tag != WAVE_FORMAT_PCM:
+            raise ValueError("Unsupported 24-bit floating-point data")
+        dtype = "i4"
+    elif bit_depth == 8:
+        dtype = "u1"
+    else:
+        if is_big_endian:
+            dtype = ">"
+        else:
+            dtype = "<"
+        if format_tag == WAVE_FORMAT_PCM:
+            dtype += "i%d" % bytes_per_sample
+        else:
+            dtype += "f%d" % bytes_per_sample
+    return dtype
+
+
+def _unpack_int24(raw, is_big_endian, out=None):
+    """
+    Decode packed 24-bit samples (a 1-D uint8 array of 3 bytes per sample)
+    into int32 samples occupying the upper 24 bits, so that they have the
+    range of 32-bit PCM.  Each sample's bytes are copied into the top three
+    bytes of an int32 through a byte view, with no per-sample unpacking.
+    """
+    raw = raw.reshape(-1, 3)
+    if out is None:
+        out = numpy.empty(raw.shape[0], dtype=numpy.int32)
+    dest = out.reshape(-1).view("u1").reshape(-1, 4)
+    dest[:, 0] = 0
+    if is_big_endian:
+        dest[:, 1:] = raw[:, ::-1]
+    else:
+        dest[:, 1:] = raw
+    if sys.byteorder == "big":
+        out.byteswap(inplace=True)
+    return out
+
+
+def _pack_int24(data):
+    """
+    Encode int32 samples into little-endian packed 24-bit samples (a uint8
+    array of shape (Nsamples, 3)), keeping the upper 24 bits of each.
+    """
+    data = numpy.ascontiguousarray(data, dtype="<i4").reshape(-1)
+    return data.view("u1").reshape(-1, 4)[:, 1:]
+
+
+# number of samples decoded at a time when memory-mapping 24-bit data
+_INT24_BLOCK = 1 << 20
+
+
 # assumes file pointer is immediately after the 'data' id
 def _read_data_chunk(fid, format_tag, channels, bit_depth, is_big_endian, mmap=False):
     if is_big_endian:
@@ -140,18 +203,24 @@ def _read_data_chunk(fid, format_tag, channels, bit_depth, is_big_endian, mmap=F
 
     # Number of bytes per sample
     bytes_per_sample = bit_depth // 8
-    if bit_depth == 8:
-        dtype = "u1"
-    else:
-        if is_big_endian:
-            dtype = ">"
+    dtype = _data_dtype(format_tag, bit_depth, is_big_endian)
+    if bit_depth == 24:
+        size -= size % 3
+        if not mmap:
+            raw = numpy.frombuffer(fid.read(size), dtype="u1")
+            data = _unpack_int24(raw, is_big_endian)
         else:
-            dtype = "<"
-        if format_tag == WAVE_FORMAT_PCM:
-            dtype += "i%d" % bytes_per_sample
-        else:
-            dtype += "f%d" % bytes_per_sample
-    if not mmap:
+            # decode the mapped bytes a block at a time, so that no more than
+            # one block of them has to be paged in at once
+            start = fid.tell()
+            raw = numpy.memmap(fid, dtype="u1", mode="r", offset=start, shape=(size,))
+            data = numpy.empty(size // 3, dtype=numpy.int32)
+            for i in range(0, data.size, _INT24_BLOCK):
+                chunk = raw[3 * i : 3 * (i + _INT24_BLOCK)]
+                _unpack_int24(chunk, is_big_endian, data[i : i + _INT24_BLOCK])
+            del raw
+            fid.seek(start + size)
+    elif not mmap:
         data = numpy.frombuffer(fid.read(size), dtype=dtype)
     else:
         start = fid.tell()
@@ -229,8 +298,6 @@ def read(filename, mmap=False):
 
     Notes
     -----
-    This function cannot read wav files with 24-bit data.
-
     Common data types: [1]_
 
     =====================  ===========  ===========  =============
@@ -238,12 +305,18 @@ def read(filename, mmap=False):
     =====================  ===========  ===========  =============
     32-bit floating-point  -1.0         +1.0         float32
     32-bit PCM             -2147483648  +2147483647  int32
+    24-bit PCM             -2147483648  +2147483392  int32
     16-bit PCM             -32768       +32767       int16
     8-bit PCM              0            255          uint8
     =====================  ===========  ===========  =============
 
     Note that 8-bit PCM is unsigned.
 
+    24-bit samples are returned in the upper 24 bits of int32 values (the
+    lowest byte is zero), so they can be scaled like 32-bit PCM.  With
+    ``mmap=True`` they are decoded into memory, since they cannot be mapped
+    as an int32 array.
+
     References
     ----------
     .. [1] IBM Corporation and Microsoft Corporation, "Multimedia Programming
@@ -278,7 +351,7 @@ def read(filename, mmap=False):
                 fmt_chunk = _read_fmt_chunk(fid, is_big_endian)
                 format_tag, channels, fs = fmt_chunk[1:4]
                 bit_depth = fmt_chunk[6]
-                if bit_depth not in (8, 16, 32, 64, 96, 128):
+                if bit_depth not in (8, 16, 24, 32, 64, 96, 128):
                     raise ValueError(
                         "Unsupported bit depth: the wav file "
                         "has {}-bit data.".format(bit_depth)
@@ -311,7 +384,240 @@ def read(filename, mmap=False):
     return fs, data
 
 
-def write(filename, rate, data):
+class WavReader(object):
+    """
+    Read a WAV file incrementally, one block of frames at a time.
+
+    The RIFF and fmt chunks are parsed once, when the reader is created;
+    samples from the data chunk are then only read from disk as `blocks` is
+    iterated, so files much larger than the available memory can be
+    processed.
+
+    Parameters
+    ----------
+    filename : string or open file handle
+        Input wav file.
+
+    Attributes
+    ----------
+    rate : int
+        Sample rate of wav file.
+    channels : int
+        Number of channels.
+    dtype : numpy dtype
+        Data-type of the samples, as for `read` (int32 for 24-bit files).
+    nframes : int
+        Number of frames (samples per channel) in the data chunk.
+
+    Notes
+    -----
+    The reader can be used as a context manager, which closes the underlying
+    file (unless an open file handle was given) on exit.
+    """
+
+    def __init__(self, filename):
+        if hasattr(filename, "read"):
+            self._fid = filename
+            self._owns_fid = False
+        else:
+            self._fid = open(filename, "rb")
+            self._owns_fid = True
+
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self):
+        fid = self._fid
+        file_size, is_big_endian = _read_riff_chunk(fid)
+        fmt_chunk_received = False
+        while fid.tell() < file_size:
+            chunk_id = fid.read(4)
+
+            if not chunk_id:
+                raise ValueError("Unexpected end of file.")
+            elif len(chunk_id) < 4:
+                raise ValueError("Incomplete wav chunk.")
+
+            if chunk_id == b"fmt ":
+                fmt_chunk_received = True
+                fmt_chunk = _read_fmt_chunk(fid, is_big_endian)
+                format_tag, channels, fs = fmt_chunk[1:4]
+                bit_depth = fmt_chunk[6]
+                if bit_depth not in (8, 16, 24, 32, 64, 96, 128):
+                    raise ValueError(
+                        "Unsupported bit depth: the wav file "
+                        "has {}-bit data.".format(bit_depth)
+                    )
+            elif chunk_id == b"data":
+                if not fmt_chunk_received:
+                    raise ValueError("No fmt chunk before data")
+                fmt = ">I" if is_big_endian else "<I"
+                size = struct.unpack(fmt, fid.read(4))[0]
+                break
+            else:
+                _skip_unknown_chunk(fid, is_big_endian)
+        else:
+            raise ValueError("No data chunk found")
+
+        self.rate = fs
+        self.channels = channels
+        self.dtype = numpy.dtype(_data_dtype(format_tag, bit_depth, is_big_endian))
+        self._int24 = bit_depth == 24
+        self._is_big_endian = is_big_endian
+        self._frame_bytes = channels * (bit_depth // 8)
+        self.nframes = size // self._frame_bytes
+        self._data_start = fid.tell()
+
+    def blocks(self, blocksize, overlap=0):
+        """
+        Iterate over the frames of the data chunk in blocks.
+
+        Parameters
+        ----------
+        blocksize : int
+            Number of frames in each block.  The last block may be shorter.
+        overlap : int, optional
+            Number of frames shared by consecutive blocks (Default: 0), so
+            that each block starts ``blocksize - overlap`` frames after the
+            previous one.
+
+        Yields
+        ------
+        data : numpy array
+            A 1-D array (mono) or 2-D array of shape (Nframes, Nchannels).
+
+        Notes
+        -----
+        Each block is a view into a single buffer that is reused for the
+        next block, so memory use is constant regardless of file length.
+        Copy a block if it needs to outlive the iteration step.
+        """
+        if blocksize < 1:
+            raise ValueError("blocksize must be positive")
+        if not 0 <= overlap < blocksize:
+            raise ValueError("overlap must be in the range [0, blocksize)")
+        hop = blocksize - overlap
+
+        if self.channels > 1:
+            buf = numpy.empty((blocksize, self.channels), dtype=self.dtype)
+        else:
+            buf = numpy.empty(blocksize, dtype=self.dtype)
+
+        if self._int24:
+            raw = numpy.empty(blocksize * self._frame_bytes, dtype="u1")
+
+        self._fid.seek(self._data_start)
+        remaining = self.nframes
+        filled = 0
+        # frames at the start of buf that were already part of a yielded block
+        seen = 0
+        while remaining > 0:
+            count = min(blocksize - filled, remaining)
+            if self._int24:
+                dest = raw[: count * self._frame_bytes]
+                count = self._fid.readinto(dest) // self._frame_bytes
+                _unpack_int24(
+                    dest[: count * self._frame_bytes],
+                    self._is_big_endian,
+                    buf[filled : filled + count],
+                )
+            else:
+                dest = buf[filled : filled + count].reshape(-1).view("u1")
+                count = self._fid.readinto(dest) // self._frame_bytes
+            if count == 0:
+                break
+            filled += count
+            remaining -= count
+            if filled < blocksize and remaining > 0:
+                continue
+            yield buf[:filled]
+            if filled < blocksize:
+                return
+            buf[:overlap] = buf[hop:]
+            filled = seen = overlap
+        if filled > seen:
+            yield buf[:filled]
+
+    def close(self):
+        """
+        Close the underlying file, if it was opened by the reader.
+        """
+        if self._owns_fid:
+            self._fid.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _channels(data):
+    if data.ndim == 1:
+        return 1
+    return data.shape[1]
+
+
+def _bit_depth(dtype, bit_depth):
+    """
+    Returns the number of bits per sample to write for data of the given
+    dtype, checking that a requested bit_depth is supported.
+    """
+    if bit_depth is None or bit_depth == dtype.itemsize * 8:
+        return dtype.itemsize * 8
+    if bit_depth == 24 and dtype == numpy.int32:
+        return 24
+    raise ValueError("Cannot write %s data as %r-bit samples" % (dtype, bit_depth))
+
+
+def _make_header(fs, dtype, channels, nframes, bit_depth=None):
+    """
+    Returns the RIFF, fmt and (for non-PCM data) fact chunks of a WAV file
+    holding nframes frames of the given dtype, with the RIFF size left as
+    zero.
+    """
+    dkind = dtype.kind
+    if not (dkind == "i" or dkind == "f" or (dkind == "u" and dtype.itemsize == 1)):
+        raise ValueError("Unsupported data type '%s'" % dtype)
+    bit_depth = _bit_depth(dtype, bit_depth)
+
+    header_data = b""
+
+    header_data += b"RIFF"
+    header_data += b"\x00\x00\x00\x00"
+    header_data += b"WAVE"
+
+    # fmt chunk
+    header_data += b"fmt "
+    if dkind == "f":
+        format_tag = WAVE_FORMAT_IEEE_FLOAT
+    else:
+        format_tag = WAVE_FORMAT_PCM
+    bytes_per_second = fs * (bit_depth // 8) * channels
+    block_align = channels * (bit_depth // 8)
+
+    fmt_chunk_data = struct.pack(
+        "<HHIIHH", format_tag, channels, fs, bytes_per_second, block_align, bit_depth
+    )
+    if not (dkind == "i" or dkind == "u"):
+        # add cbSize field for non-PCM files
+        fmt_chunk_data += b"\x00\x00"
+
+    header_data += struct.pack("<I", len(fmt_chunk_data))
+    header_data += fmt_chunk_data
+
+    # fact chunk (non-PCM files)
+    if not (dkind == "i" or dkind == "u"):
+        header_data += b"fact"
+        header_data += struct.pack("<II", 4, nframes)
+
+    return header_data
+
+
+def write(filename, rate, data, bit_depth=None):
     """
     Write a numpy array as a WAV file.
 
@@ -323,13 +629,18 @@ def write(filename, rate, data):
         The sample rate (in samples/sec).
     data : ndarray
         A 1-D or 2-D numpy array of either integer or float data-type.
+    bit_depth : int, optional
+        Bits per sample.  The only value that differs from the size of the
+        data-type is 24, which writes int32 data as 24-bit PCM, keeping the
+        upper 24 bits of each sample (as returned by `read`).
 
     Notes
     -----
     * Writes a simple uncompressed WAV file.
     * To write multiple-channels, use a 2-D array of shape
       (Nsamples, Nchannels).
-    * The bits-per-sample and PCM/float will be determined by the data-type.
+    * Unless bit_depth is given, the bits-per-sample and PCM/float will be
+      determined by the data-type.
 
     Common data types: [1]_
 
@@ -360,52 +671,11 @@ def write(filename, rate, data):
     fs = rate
 
     try:
-        dkind = data.dtype.kind
-        if not (
-            dkind == "i" or dkind == "f" or (dkind == "u" and data.dtype.itemsize == 1)
-        ):
-            raise ValueError("Unsupported data type '%s'" % data.dtype)
-
-        header_data = b""
-
-        header_data += b"RIFF"
-        header_data += b"\x00\x00\x00\x00"
-        header_data += b"WAVE"
-
-        # fmt chunk
-        header_data += b"fmt "
-        if dkind == "f":
-            format_tag = WAVE_FORMAT_IEEE_FLOAT
-        else:
-            format_tag = WAVE_FORMAT_PCM
-        if data.ndim == 1:
-            channels = 1
-        else:
-            channels = data.shape[1]
-        bit_depth = data.dtype.itemsize * 8
-        bytes_per_second = fs * (bit_depth // 8) * channels
-        block_align = channels * (bit_depth // 8)
-
-        fmt_chunk_data = struct.pack(
-            "<HHIIHH",
-            format_tag,
-            channels,
-            fs,
-            bytes_per_second,
-            block_align,
-            bit_depth,
+        header_data = _make_header(
+            fs, data.dtype, _channels(data), data.shape[0], bit_depth
         )
-        if not (dkind == "i" or dkind == "u"):
-            # add cbSize field for non-PCM files
-            fmt_chunk_data += b"\x00\x00"
-
-        header_data += struct.pack("<I", len(fmt_chunk_data))
-        header_data += fmt_chunk_data
-
-        # fact chunk (non-PCM files)
-        if not (dkind == "i" or dkind == "u"):
-            header_data += b"fact"
-            header_data += struct.pack("<II", 4, data.shape[0])
+        if _bit_depth(data.dtype, bit_depth) == 24:
+            data = _pack_int24(data)
 
         # check data size (needs to be immediately before the data chunk)
         if ((len(header_data) - 4 - 4) + (4 + 4 + data.nbytes)) > 0xFFFFFFFF:
@@ -435,6 +705,115 @@ def write(filename, rate, data):
             fid.seek(0)
 
 
+class WavWriter(object):
+    """
+    Write a WAV file incrementally, one block of frames at a time.
+
+    The header is written with placeholder sizes when the writer is created,
+    each call to `write` appends its block to the data chunk, and the RIFF,
+    data (and, for float data, fact) sizes are patched in by `close`.  Only
+    the block being written needs to be in memory.
+
+    Parameters
+    ----------
+    filename : string or open file handle
+        Output wav file.  An open file handle must be seekable.
+    rate : int
+        The sample rate (in samples/sec).
+    dtype : numpy dtype
+        Data-type of the samples to be written; see `write` for the supported
+        types.
+    channels : int, optional
+        Number of channels (Default: 1).
+    bit_depth : int, optional
+        Bits per sample, as for `write` (24 writes int32 data as 24-bit PCM).
+
+    Notes
+    -----
+    The writer can be used as a context manager, which calls `close` on exit.
+    """
+
+    def __init__(self, filename, rate, dtype, channels=1, bit_depth=None):
+        self.rate = rate
+        self.dtype = numpy.dtype(dtype)
+        self.channels = channels
+        self.nframes = 0
+        self.bit_depth = _bit_depth(self.dtype, bit_depth)
+
+        header_data = _make_header(rate, self.dtype, channels, 0, self.bit_depth)
+        if hasattr(filename, "write"):
+            self._fid = filename
+            self._owns_fid = False
+        else:
+            self._fid = open(filename, "wb")
+            self._owns_fid = True
+        self._start = self._fid.tell()
+        self._fid.write(header_data)
+        if self.dtype.kind == "f":
+            self._fact_pos = self._start + len(header_data) - 4
+        else:
+            self._fact_pos = None
+        self._fid.write(b"data")
+        self._data_size_pos = self._fid.tell()
+        self._fid.write(b"\x00\x00\x00\x00")
+        self._closed = False
+
+    def write(self, data):
+        """
+        Append a block of frames to the data chunk.
+
+        Parameters
+        ----------
+        data : ndarray
+            A 1-D array (mono) or a 2-D array of shape (Nframes, Nchannels).
+            It is converted to the writer's dtype if necessary.
+        """
+        data = numpy.asarray(data)
+        if _channels(data) != self.channels:
+            raise ValueError(
+                "Expected %d channel(s), got %d" % (self.channels, _channels(data))
+            )
+        data = data.astype(self.dtype.newbyteorder("<"), copy=False)
+        nframes = data.shape[0]
+        data_size = (self.nframes + nframes) * self.channels * (self.bit_depth // 8)
+        if self._data_size_pos - self._start + data_size > 0xFFFFFFFF:
+            raise ValueError("Data exceeds wave file size limit")
+        if self.bit_depth == 24:
+            data = _pack_int24(data)
+        _array_tofile(self._fid, data)
+        self.nframes += nframes
+
+    def close(self):
+        """
+        Patch the chunk sizes into the header and close the file (if it was
+        opened by the writer).
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            end = self._fid.tell()
+            self._fid.seek(self._start + 4)
+            self._fid.write(struct.pack("<I", end - self._start - 8))
+            self._fid.seek(self._data_size_pos)
+            self._fid.write(struct.pack("<I", end - self._data_size_pos - 4))
+            if self._fact_pos is not None:
+                self._fid.seek(self._fact_pos)
+                self._fid.write(struct.pack("<I", self.nframes))
+            self._fid.seek(end)
+        finally:
+            if self._owns_fid:
+                self._fid.close()
+            else:
+                self._fid.seek(self._start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 if sys.version_info[0] >= 3:
 
     def _array_tofile(fid, data):
@@ -2,7 +2,9 @@
 
 from math import sin, cos, pi
 from matplotlib.pyplot import plot, show
+from numpy import arange
 from lib6003.audio import wav_write
+from lib6003.series import fourier_series
 
 # example plot: f(t) = cos(2*pi*t)
 t_list = []          # list of times
@@ -34,19 +36,12 @@ import pickle
 with open('mystery.pkl','rb') as f:
     c_k,d_k = pickle.load(f)
     
-t_list = []          # list of times
-f_list = []          # list of corresponding values of f(t)
-t = 0
-m = len(c_k)
 omega = 2*pi*15000/fs
+num_samples = round(2.9*fs)
 
-while t<2.9:
-    t_list.append(t)
-    sum_ = 0
-    for k in range(m):
-    	sum_ += 0*c_k[k]*cos(k*omega*t) + d_k[k]*sin(k*omega*t)
-    f_list.append(sum_)
-    t += T
+# times from integer sample counts, rather than accumulating t += T
+t_list = arange(num_samples)/fs
+f_list = fourier_series([0*c for c in c_k], d_k, omega/(2*pi), num_samples, fs)
 wav_write(f_list,fs,'lab2_2c.wav')
 plot(t_list, f_list)
 show()
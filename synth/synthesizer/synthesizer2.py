@@ -1,109 +1,78 @@
 #!/usr/bin/env python3
+import sys
 from lib6003.audio import wav_read, wav_write
-from math import pi, sin, cos, e
-from matplotlib.pyplot import stem, show, plot
+from lib6003.fft import harmonic_coefficients
+from lib6003.score import load as load_score, to_tune
+from lib6003.synthesis import render_tune, NoteCache, band_limit_stats, reset_band_limit_stats
+from lib6003.sampler import load_sampler
+from lib6003.timbre import build_timbre, compare
 
-tune = [
-    (369.99, 0.16666666666666666), (415.3, 0.16666666666666666),
-    (440.0, 0.5), (369.99, 0.5), (369.99, 0.3333333333333333),
-    (369.99, 0.16666666666666666), (369.99, 0.3333333333333333),
-    (369.99, 0.3333333333333333), (329.63, 0.16666666666666666),
-    (369.99, 0.3333333333333333), (369.99, 0.3333333333333333),
-    (329.63, 0.16666666666666666), (329.63, 0.5),
-    (246.94, 0.3333333333333333), (493.88, 0.3333333333333333),
-    (246.94, 0.3333333333333333), (493.88, 0.3333333333333333),
-    (369.99, 0.16666666666666666), (415.3, 0.16666666666666666),
-    (440.0, 0.5), (369.99, 0.5), (369.99, 0.3333333333333333),
-    (369.99, 0.16666666666666666), (369.99, 0.3333333333333333),
-    (369.99, 0.3333333333333333), (329.63, 0.16666666666666666),
-    (369.99, 0.3333333333333333), (369.99, 0.3333333333333333),
-    (329.63, 0.16666666666666666), (329.63, 0.5),
-    (246.94, 0.3333333333333333), (493.88, 0.3333333333333333),
-    (246.94, 0.3333333333333333), (493.88, 0.6666666666666666),
-    (277.18, 0.3333333333333333), (369.99, 0.3333333333333333),
-    (415.3, 0.3333333333333333), (440.0, 0.3333333333333333),
-    (415.3, 0.16666666666666666), (440.0, 0.16666666666666666),
-    (415.3, 0.16666666666666666), (369.99, 0.16666666666666666),
-    (415.3, 0.3333333333333333), (369.99, 0.3333333333333333),
-    (277.18, 1.3333333333333333), (246.94, 1.1666666666666665),
-    (277.18, 0.16666666666666666), (277.18, 0.3333333333333333),
-    (369.99, 0.3333333333333333), (415.3, 0.3333333333333333),
-    (440.0, 0.3333333333333333), (415.3, 0.6666666666666666),
-    (369.99, 0.6666666666666666), (277.18, 1.3333333333333333),
-    (246.94, 1.3333333333333333), (277.18, 0.3333333333333333),
-    (369.99, 0.3333333333333333), (415.3, 0.3333333333333333),
-    (440.0, 0.3333333333333333), (415.3, 0.16666666666666666),
-    (440.0, 0.16666666666666666), (415.3, 0.16666666666666666),
-    (369.99, 0.16666666666666666), (415.3, 0.3333333333333333),
-    (369.99, 0.3333333333333333), (277.18, 1.3333333333333333),
-    (246.94, 1.1666666666666665), (277.18, 0.16666666666666666),
-    (277.18, 0.3333333333333333), (369.99, 0.3333333333333333),
-    (415.3, 0.3333333333333333), (440.0, 0.3333333333333333),
-    (415.3, 0.6666666666666666), (369.99, 0.6666666666666666),
-    (277.18, 1.3333333333333333), (246.94, 1.3333333333333333),
-    (277.18, 1.3333333333333333)]
+fs = 44100
+
+# "python3 synthesizer2.py sampler" plays the recordings themselves, looped
+# and resampled to each pitch, instead of resynthesizing them from their
+# harmonic coefficients
+use_sampler = sys.argv[1:] == ["sampler"]
+
+# "python3 synthesizer2.py timbre" resynthesizes them from only the harmonics
+# needed for a 40 dB signal-to-noise ratio, and reports how much faster that
+# is than using every coefficient
+use_timbre = sys.argv[1:] == ["timbre"]
+
+# the tune as (frequency, duration) pairs, read from a saved score
+tune = to_tune(load_score("tune.npy"), fs)
 
 # generate the template from "oboe_C4.wav"
 oboe_note, oboe_sampling_rate = wav_read("oboe_C4.wav")
 sax_note, sax_sampling_rate = wav_read("sax_C4.wav")
 trumpet_note, trumpet_sampling_rate = wav_read("trumpet_C4.wav")
-fs = 44100
-
-def old_synthesis(omega_t):
-	return 0.5*sin(omega_t) + 0.2*cos(2*omega_t) + 0.3*cos(4*omega_t - pi/4)
-
-def synthesis(a_k, n, k, upper_n):
-	omega = 2*pi/upper_n
-	return a_k*e**(1j*k*omega*n)
 
-def analysis(f, n, k, upper_n):
-	omega = 2*pi/upper_n
-	return f*e**(-1j*k*omega*n)
-	
 def get_coefficients(note, sampling_rate):
 	upper_n = sampling_rate/261
-	coeffs = []
-	
-	for k in range(0, int(upper_n)): 
-		n = 0
-		sum_ = 0 + 0j
-		for pulse in note[20000: 20000 + int(upper_n)]:
-			sum_ += analysis(pulse, n, k, upper_n)
-			n += 1
-		coeff = sum_/upper_n
-		coeffs.append(coeff)
-	
-	return coeffs
+	return harmonic_coefficients(note, upper_n, start=20000)
 	
+# notes of the tune that repeat at the same pitch, length and starting phase
+# are only synthesized once per instrument; exact_phase=False would reuse
+# far more of them, but shifted by up to half a sample, which audibly changes
+# the output
+note_cache = NoteCache(exact_phase=True)
+
 def reconstruct_song(coeffs):
-	song = []
-	n = 0
-	
-	for frequency, duration in tune:
-		num_samples = round(fs*duration)
-		for _ in range(num_samples):
-			k = 0
-			sum_ = 0 + 0j
-			
-			for a_k in coeffs:
-				upper_n = fs/frequency
-				sum_ += synthesis(a_k, n, k, upper_n)
-				k += 1
-			n += 1
-			song.append(sum_)
-	return song
+	return render_tune(coeffs, tune, fs, cache=note_cache)
 	
 	
-oboe_coeffs = get_coefficients(oboe_note, oboe_sampling_rate)
+if use_sampler:
+	oboe_coeffs = load_sampler("oboe_C4.wav")
+	trumpet_coeffs = load_sampler("trumpet_C4.wav")
+	sax_coeffs = load_sampler("sax_C4.wav")
+elif use_timbre:
+	print("{:8} {:>9} {:>9} {:>8} {:>8}".format("", "harmonics", "kept", "speed-up", "SNR (dB)"))
+	instruments = []
+	for name, note, rate in [("oboe", oboe_note, oboe_sampling_rate), ("trumpet", trumpet_note, trumpet_sampling_rate), ("sax", sax_note, sax_sampling_rate)]:
+		coeffs = get_coefficients(note, rate)
+		timbre = build_timbre(coeffs, snr=40, max_frequency=max(frequency for frequency, _ in tune), fs=fs)
+		report = compare(coeffs, timbre, tune, fs)
+		print("{:8} {:9d} {:9d} {:7.2f}x {:8.1f}".format(name, report["harmonics"], report["kept"], report["speedup"], report["snr"]))
+		instruments.append(timbre)
+	oboe_coeffs, trumpet_coeffs, sax_coeffs = instruments
+	# count only the rendering of the songs below
+	reset_band_limit_stats()
+else:
+	oboe_coeffs = get_coefficients(oboe_note, oboe_sampling_rate)
+	trumpet_coeffs = get_coefficients(trumpet_note, trumpet_sampling_rate)
+	sax_coeffs = get_coefficients(sax_note, sax_sampling_rate)
+
 oboe_song = reconstruct_song(oboe_coeffs)
 wav_write(oboe_song, fs, 'oboe_song.wav')
 
-trumpet_coeffs = get_coefficients(trumpet_note, trumpet_sampling_rate)
 trumpet_song = reconstruct_song(trumpet_coeffs)
 wav_write(trumpet_song, fs, 'trumpet_song.wav')
 
-sax_coeffs = get_coefficients(sax_note, sax_sampling_rate)
 sax_song = reconstruct_song(sax_coeffs)
 wav_write(sax_song, fs, 'sax_song.wav')
+print("note cache: {} hits, {} misses".format(note_cache.hits, note_cache.misses))
+if band_limit_stats["notes"]:
+	print("band limiting: {} of {} harmonic-samples dropped".format(
+		band_limit_stats["dropped"], band_limit_stats["dropped"] + band_limit_stats["kept"]))
 
 